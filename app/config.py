@@ -9,6 +9,7 @@ DATABASE_URL = f"sqlite:///{os.path.join(BASE_DIR, 'data', 'eagle_eye.db')}"
 
 # --- Data Paths ---
 ENCODINGS_DIR = os.path.join(BASE_DIR, 'data', 'face_encodings')
+MODELS_DIR = os.path.join(BASE_DIR, 'data', 'models')  # Exported/optimized model caches
 
 # --- Output Paths ---
 ATTENDANCE_REPORTS_DIR = os.path.join(BASE_DIR, 'outputs', 'attendance_reports')
@@ -17,20 +18,39 @@ VIOLATION_SNAPSHOTS_DIR = os.path.join(SUPERVISION_REPORTS_DIR, 'violation_snaps
 
 # --- Model & Processing Settings ---
 FACE_TOLERANCE = 0.6
-FACE_DETECTION_MODEL = 'hog'
+FACE_DETECTION_MODEL = 'auto'  # 'hog', 'cnn', or 'auto' (cnn when dlib can use a CUDA GPU)
 CAMERA_INDEX = 0
+CAMERA_FPS = 30  # Frame rate requested from the camera
+HEADLESS = os.getenv('EAGLEEYE_HEADLESS') == '1'  # No preview windows in the standalone scripts; stop them with Ctrl+C
 EYE_AR_THRESH = 0.25   # Eye Aspect Ratio threshold for blink detection
+DETECTION_SCALE = 0.5  # Frames are resized by this factor before face/gaze detection
+FACE_DETECTION_UPSAMPLE = 1  # Detector upsampling passes, as in the baseline (HOG finds faces >= ~40 px in the image it is given)
+FACE_BATCH_SIZE = 8          # Frames per batched CNN detection call (GPU only; HOG runs one at a time)
+FACE_BATCH_DEADLINE = 0.033  # Max seconds the oldest frame waits for its batch to fill
+FACE_DETECT_EVERY = 5        # Faces/gaze are re-detected every Nth frame; frames in between reuse the results
+FACE_RECOGNIZE_EVERY = 3     # Standalone supervisor: faces are identified every Nth frame (gaze still runs on every frame)
+OBJECT_DETECT_EVERY = 5      # Standalone supervisor: YOLO runs every Nth frame
+MIN_ANALYSIS_FACE_SIZE = 80  # Standalone supervisor: pose/gaze are skipped unless a face is at least this many px
+JPEG_QUALITY = 70      # Quality of the JPEG frames streamed to the dashboard
+OPENCV_THREADS = max(1, (os.cpu_count() or 2) // 2)  # OpenCV's pool gets half the cores; the rest go to the models
+YOLO_IMGSZ = 320  # Inference size of the YOLO model (phones stay >= 20 px); exports are built for this size
+YOLO_BATCH_SIZE = 1  # Batch size YOLO exports are built for; above 1 they take dynamic batches of up to this many frames for detect_objects_batch
+YOLO_PRECISION = 'fp16'  # 'fp16' or 'int8' for exported YOLO models (CPU exports use FP32 for 'fp16'); int8 is calibrated and checked at export
+YOLO_CALIBRATION_DATA = 'coco8.yaml'  # Ultralytics dataset YAML used for INT8 calibration; point it at exam-room frames for best results
+YOLO_INT8_MIN_AGREEMENT = 0.9  # Share of full-precision detections an INT8 export must reproduce
 
 # --- Directory Initialization ---
 def initialize_directories():
-    """Creates all necessary data and output directories."""
+    """
+    Creates all necessary data and output directories.
+    Entry-point scripts call this once at start-up; importing the config has no side effects.
+    """
     dirs_to_create = [
         ENCODINGS_DIR,
+        MODELS_DIR,
         ATTENDANCE_REPORTS_DIR,
         VIOLATION_SNAPSHOTS_DIR
     ]
     for dir_path in dirs_to_create:
         os.makedirs(dir_path, exist_ok=True)
     print("All necessary directories are initialized.")
-
-initialize_directories()
@@ -1,14 +1,20 @@
 # /app/dashboard.py 
 
-import sys
 import os
+
+# Set before any numeric import; OpenMP reads it once at load (see app/main.py)
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+import sys
 import cv2
-import base64
+import numpy as np
 import threading
 import time
 import uuid
 import datetime
-import csv
+import queue
+import pathlib
+from concurrent.futures import ThreadPoolExecutor
  
 from flask import Flask, render_template, request, redirect, url_for
 from flask_socketio import SocketIO, emit
@@ -20,48 +26,19 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 # --- Core App Modules ---
 from app.user import User, users, get_user
-from app.database import SessionLocal, Violation
-from app.config import CAMERA_INDEX, VIOLATION_SNAPSHOTS_DIR, ATTENDANCE_REPORTS_DIR
-from run_supervision import SupervisionSystem
-# Import all model classes, not just SupervisionSystem
-from app.ml_models.face_detector import FaceRecognizer
-from app.ml_models.object_detection import ObjectDetector
-from app.ml_models.pose_estimation import PoseEstimator
-from app.ml_models.gaze_tracking import GazeTracker
-from app.ml_models.audio_analysis import AudioAnalyzer
+from app.database import engine, Violation
+from app.config import CAMERA_INDEX, VIOLATION_SNAPSHOTS_DIR, ATTENDANCE_REPORTS_DIR, JPEG_QUALITY, DETECTION_SCALE
+from app.utils.helpers import draw_boxes, AttendanceLog, CameraBroker, configure_opencv
+# The rule engine is pure Python. The ML models pull in dlib, torch and mediapipe, so they
+# are imported inside the threads that use them to keep server start-up and /login fast.
 from app.ml_models.alert_system import generate_alerts
 
-def log_violation_thread_safe(alert_data, person_id='N/A', snapshot_path=None):
-    """
-    Thread-safe violation logging with its own database session.
-    Place this function near the top of dashboard.py, after the imports.
-    """
-    db = SessionLocal()
-    try:
-        # Use current time for consistency
-        timestamp = datetime.datetime.now()
-        
-        new_violation = Violation(
-            student_id=person_id,
-            violation_type=alert_data.get('type', 'Unknown'),
-            timestamp=timestamp,
-            details=alert_data.get('details', alert_data.get('message', '')),
-            snapshot_path=snapshot_path
-        )
-        db.add(new_violation)
-        db.commit()
-        print(f"[DB] Logged violation: {alert_data.get('type')} for {person_id}")
-    except SQLAlchemyError as e:
-        print(f"[DB ERROR] Failed to log violation: {e}")
-        db.rollback()
-    except Exception as e:
-        print(f"[ERROR] Unexpected error in violation logging: {e}")
-    finally:
-        db.close()
-        
 # --- Flask & SocketIO Setup ---
 app = Flask(__name__)
 app.config['SECRET_KEY'] = 'a_truly_secret_key_for_eagle_eye'
+# The camera and ML work run in native threads that block inside C code, so Socket.IO stays on
+# OS threads rather than eventlet/gevent green threads. simple-websocket (see requirements.txt)
+# lets threading mode upgrade clients to a real WebSocket instead of HTTP long-polling.
 socketio = SocketIO(app, async_mode='threading')
 
 # --- Login Manager Setup ---
@@ -79,39 +56,149 @@ stop_events = {}
 thread_cleanup_lock = threading.Lock()
 
 ### NEW: Global State for Admin Controls ###
-controls_state = {
+# The dict is never mutated in place: updates build a new dict and rebind the name, which
+# is atomic, so the supervision loop can read it every frame without locking or copying.
+controls_snapshot = {
     "audio": True,
     "gaze": True,
     "object": True,
     "posture": True
 }
-controls_lock = threading.Lock()
+controls_lock = threading.Lock()  # Serializes writers only
+
+# Violations are buffered here and written in batches by violation_writer_thread
+VIOLATION_BATCH_SIZE = 50
+VIOLATION_FLUSH_INTERVAL = 1.0
+violation_q = queue.Queue(maxsize=1000)
+VIOL_INSERT = Violation.__table__.insert()
+
+# Evidence snapshots (raw frame copy, paths) waiting to be encoded and written by
+# snapshot_writer_thread. Bounded so a persistent high alert can't pile up frames in memory.
+SNAPSHOT_QUEUE_SIZE = 8
+snapshot_q = queue.Queue(maxsize=SNAPSHOT_QUEUE_SIZE)
+
+# Long-lived writer threads, keyed by name and started on first use
+_background_workers = {}
+_background_workers_lock = threading.Lock()
+
+# The camera is opened once and its frames are shared by every namespace thread
+camera_broker = CameraBroker(CAMERA_INDEX)
+
+# A single FaceRecognizer is shared by every thread and handler so the known-face
+# database is only loaded from disk once.
+_face_recognizer = None
+_fr_lock = threading.Lock()
 
 # --- Helper Functions ---
 
+def get_face_recognizer():
+    """Returns the shared FaceRecognizer, creating it on first use."""
+    global _face_recognizer
+    if _face_recognizer is None:
+        with _fr_lock:
+            if _face_recognizer is None:
+                from app.ml_models.face_detector import FaceRecognizer
+                _face_recognizer = FaceRecognizer()
+    return _face_recognizer
+
+JPEG_PARAMS = [cv2.IMWRITE_JPEG_QUALITY, JPEG_QUALITY]
+VS_DIR = pathlib.Path(VIOLATION_SNAPSHOTS_DIR)
+
+# Target time per loop iteration for the camera threads
+SUPERVISION_FRAME_INTERVAL = 1 / 30
+FEED_FRAME_INTERVAL = 1 / 20
+
+# Static-scene gate: when the mean absolute difference of a 64x36 grayscale thumbnail stays
+# under STATIC_FRAME_THRESHOLD, the previous detections are reused, for at most
+# STATIC_REFRESH_INTERVAL seconds before the models are forced to run again.
+STATIC_FRAME_THRESHOLD = 2.0
+STATIC_REFRESH_INTERVAL = 1.0
+
+def pace_frame(frame_start, target_dt):
+    """Sleeps only for what is left of the frame budget after the work done since `frame_start`."""
+    socketio.sleep(max(0.0, target_dt - (time.monotonic() - frame_start)))
+
 def log_violation_thread_safe(alert_data, person_id='N/A', snapshot_path=None):
-    """Thread-safe violation logging with its own database session"""
-    db = SessionLocal()
+    """
+    Queues a violation for the background writer instead of committing it inline,
+    so the supervision loop never waits on the database.
+    """
+    start_background_worker(violation_writer_thread)
+    row = dict(
+        student_id=person_id,
+        violation_type=alert_data.get('type', 'Unknown'),
+        timestamp=datetime.datetime.utcnow(),  # UTC, like the column defaults
+        details=alert_data.get('details', alert_data.get('message', '')),
+        snapshot_path=snapshot_path
+    )
     try:
-        timestamp = datetime.datetime.now()
-        
-        new_violation = Violation(
-            student_id=person_id,
-            violation_type=alert_data.get('type', 'Unknown'),
-            timestamp=timestamp,
-            details=alert_data.get('details', alert_data.get('message', '')),
-            snapshot_path=snapshot_path
-        )
-        db.add(new_violation)
-        db.commit()
-        print(f"[DB] Logged violation: {alert_data.get('type')} for {person_id}")
-    except SQLAlchemyError as e:
-        print(f"[DB ERROR] Failed to log violation: {e}")
-        db.rollback()
-    except Exception as e:
-        print(f"[ERROR] Unexpected error in violation logging: {e}")
-    finally:
-        db.close()
+        violation_q.put_nowait(row)
+    except queue.Full:
+        print(f"[DB ERROR] Violation queue is full, dropping: {alert_data.get('type')} for {person_id}")
+
+def start_background_worker(target):
+    """Starts a daemon thread running `target`, unless one is already alive."""
+    with _background_workers_lock:
+        worker = _background_workers.get(target.__name__)
+        if worker is None or not worker.is_alive():
+            worker = threading.Thread(target=target, name=target.__name__, daemon=True)
+            _background_workers[target.__name__] = worker
+            worker.start()
+
+def violation_writer_thread():
+    """
+    Drains the violation queue into the database. Rows are committed in batches of up
+    to VIOLATION_BATCH_SIZE, or after VIOLATION_FLUSH_INTERVAL seconds, whichever comes
+    first, so a burst of alerts costs one transaction instead of one per alert. Rows go
+    through a Core insert, which skips the ORM unit-of-work for this write-only path.
+    """
+    while True:
+        batch = [violation_q.get()]
+        deadline = time.monotonic() + VIOLATION_FLUSH_INTERVAL
+        while len(batch) < VIOLATION_BATCH_SIZE:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(violation_q.get(timeout=remaining))
+            except queue.Empty:
+                break
+
+        try:
+            with engine.begin() as conn:
+                conn.execute(VIOL_INSERT, batch)
+            print(f"[DB] Logged {len(batch)} violation(s)")
+        except SQLAlchemyError as e:
+            print(f"[DB ERROR] Failed to log violations: {e}")
+        except Exception as e:
+            print(f"[ERROR] Unexpected error in violation logging: {e}")
+
+def queue_evidence(frame, snapshot_paths):
+    """
+    Hands a copy of the raw camera frame to snapshot_writer_thread, to be saved at every
+    path in `snapshot_paths`. Never blocks; returns False if the evidence queue is full.
+    """
+    start_background_worker(snapshot_writer_thread)
+    try:
+        snapshot_q.put_nowait((frame.copy(), snapshot_paths))
+        return True
+    except queue.Full:
+        return False
+
+def snapshot_writer_thread():
+    """Encodes and writes queued evidence snapshots to disk, off the supervision loop."""
+    while True:
+        frame, snapshot_paths = snapshot_q.get()
+        try:
+            # Evidence keeps OpenCV's default JPEG quality, like cv2.imwrite, not the stream's
+            _, buffer = cv2.imencode('.jpg', frame)
+            jpeg_bytes = buffer.tobytes()
+            for snapshot_path in snapshot_paths:
+                with open(snapshot_path, 'wb') as f:
+                    f.write(jpeg_bytes)
+                print(f"[EVIDENCE] Saved snapshot to {snapshot_path}")
+        except Exception as e:
+            print(f"[SNAPSHOT ERROR] Failed to save evidence: {e}")
 
 def manage_thread(namespace, target_func):
     global active_threads, stop_events
@@ -137,6 +224,92 @@ def manage_thread(namespace, target_func):
         thread.start()
         print(f"Started thread for {namespace}")
 
+def _analyze_faces(face_recognizer, gaze_tracker, small_frame):
+    """
+    Detects faces once on the downscaled BGR frame and shares the detection between face
+    recognition and, unless `gaze_tracker` is None, gaze tracking. Boxes are returned
+    in full-resolution coordinates.
+
+    Returns:
+        A tuple (face_data, gaze_data).
+    """
+    scale = 1 / DETECTION_SCALE
+    if gaze_tracker is None:
+        return face_recognizer.recognize_faces(small_frame, color_order='bgr', scale=scale), []
+    face_locations, face_landmarks_list = face_recognizer.detect_faces(small_frame, color_order='bgr')
+    face_data = face_recognizer.recognize_faces(small_frame, color_order='bgr', face_locations=face_locations, scale=scale)
+    gaze_data = gaze_tracker.get_gaze_direction(small_frame, face_locations, face_landmarks_list, scale=scale)
+    return face_data, gaze_data
+
+def _check_posture(pose_estimator, frame):
+    """Returns True if the pose estimator flags a suspicious posture in the frame."""
+    _, landmarks = pose_estimator.find_pose(frame, draw=False)
+    if not landmarks:
+        return False
+    lm_list = pose_estimator.get_landmark_positions(frame.shape, landmarks)
+    return pose_estimator.check_suspicious_posture(lm_list)
+
+class FrameEmitter:
+    """
+    Encodes and emits video frames for a namespace from a dedicated background thread.
+    A single-slot queue sits between the camera loop and the encoder: if the encoder is
+    still busy with the previous frame, the new one is dropped, so JPEG encoding and slow
+    clients never stall detection and the feed never builds up a backlog.
+
+    Encoded frames are recycled into a small pool that `acquire_buffer` hands back out,
+    so callers drawing on a copy of the camera frame don't allocate a new one every frame.
+    """
+    def __init__(self, namespace):
+        self.namespace = namespace
+        self._queue = queue.Queue(maxsize=1)
+        self._free_buffers = queue.Queue(maxsize=3)
+        self._thread = threading.Thread(target=self._run, name=f"{namespace}_encoder", daemon=True)
+        self._thread.start()
+
+    def acquire_buffer(self, like):
+        """Returns a frame buffer shaped like `like`, reusing a recycled one when possible."""
+        try:
+            buffer = self._free_buffers.get_nowait()
+            if buffer.shape == like.shape and buffer.dtype == like.dtype:
+                return buffer
+        except queue.Empty:
+            pass
+        return np.empty_like(like)
+
+    def _release_buffer(self, buffer):
+        try:
+            self._free_buffers.put_nowait(buffer)
+        except queue.Full:
+            pass
+
+    def submit(self, frame, meta=None):
+        """Hands a frame (plus extra payload fields) to the encoder, dropping it if the slot is taken."""
+        item = (frame, meta or {})
+        try:
+            self._queue.put_nowait(item)
+        except queue.Full:
+            self._release_buffer(frame)
+
+    def stop(self):
+        """Stops the encoder thread once it has drained the pending frame."""
+        self._queue.put(None)
+        self._thread.join()
+
+    def _run(self):
+        while True:
+            item = self._queue.get()
+            if item is None:
+                break
+            frame, meta = item
+            try:
+                _, buffer = cv2.imencode('.jpg', frame, JPEG_PARAMS)
+                # Socket.IO ships bytes as a binary attachment, no base64 round-trip needed
+                jpeg_bytes = buffer.tobytes()
+                socketio.emit('video_frame', {'image': jpeg_bytes, **meta}, namespace=self.namespace)
+            except Exception as e:
+                print(f"[FRAME EMISSION ERROR] {e}")
+            self._release_buffer(frame)
+
 # --- Background Thread Logic ---
 
 def supervision_thread(app_context, stop_event):
@@ -145,106 +318,138 @@ def supervision_thread(app_context, stop_event):
     """
     with app_context:
         print("[DASHBOARD] Supervision thread started. Initializing systems...")
+        from app.ml_models.object_detection import ObjectDetector
+        from app.ml_models.pose_estimation import PoseEstimator
+        from app.ml_models.gaze_tracking import GazeTracker
+        from app.ml_models.audio_analysis import AudioAnalyzer
         
         # Initialize all models needed for supervision
-        face_recognizer, object_detector, pose_estimator, gaze_tracker, audio_analyzer = FaceRecognizer(), ObjectDetector(), PoseEstimator(), GazeTracker(), AudioAnalyzer()
+        face_recognizer, object_detector, pose_estimator, gaze_tracker, audio_analyzer = get_face_recognizer(), ObjectDetector(), PoseEstimator(), GazeTracker(), AudioAnalyzer()
         audio_analyzer.start()
         
-        # Open camera
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
-        if not cap.isOpened():
+        # Subscribe to the shared camera
+        camera = camera_broker.subscribe()
+        if camera is None:
             print("[DASHBOARD-ERROR] Cannot open camera in thread."); audio_analyzer.stop()
             socketio.emit('supervision_error', {'message': 'Cannot open camera'}, namespace='/supervision'); return
 
         print("[DASHBOARD] All systems initialized. Starting main loop.")
         # Emit the initial state of controls to the client
-        socketio.emit('controls_update', controls_state, namespace='/supervision')
+        socketio.emit('controls_update', controls_snapshot, namespace='/supervision')
 
         prev_frame_time = 0
+        prev_thumb = None
+        last_inference_time = 0
+        face_data, object_data, gaze_data, is_suspicious_posture = [], [], [], False
+        ml_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix='supervision_ml')
+        frame_emitter = FrameEmitter('/supervision')
         
         while not stop_event.is_set():
-            ret, frame = cap.read()
-            if not ret:
-                time.sleep(0.1)
+            frame_start = time.monotonic()
+            frame = camera.get()
+            if frame is None:
                 continue
 
-            with controls_lock:
-                current_controls = controls_state.copy()
+            current_controls = controls_snapshot
             
             # --- Conditionally run modules based on controls ---
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_data = face_recognizer.recognize_faces(rgb_frame)
-            object_data = object_detector.detect_objects(frame) if current_controls['object'] else []
-            gaze_data = gaze_tracker.get_gaze_direction(frame) if current_controls['gaze'] else []
+            # Face and gaze detection run on a downscaled RGB copy shared by both modules;
+            # the full-resolution frame is kept for display and evidence snapshots.
+            small_frame = cv2.resize(frame, (0, 0), fx=DETECTION_SCALE, fy=DETECTION_SCALE)
+
+            # Skip inference entirely while the scene is still and reuse the last results
+            thumb = cv2.resize(cv2.cvtColor(small_frame, cv2.COLOR_BGR2GRAY), (64, 36))
+            is_static = (
+                prev_thumb is not None
+                and cv2.absdiff(thumb, prev_thumb).mean() < STATIC_FRAME_THRESHOLD
+                and frame_start - last_inference_time < STATIC_REFRESH_INTERVAL
+            )
+            prev_thumb = thumb
+
+            if not is_static:
+                # The models release the GIL inside their native code, so they run concurrently.
+                # Disabled modules are never submitted.
+                f_face = ml_pool.submit(_analyze_faces, face_recognizer, gaze_tracker if current_controls['gaze'] else None, small_frame)
+                f_obj = ml_pool.submit(object_detector.detect_objects, frame) if current_controls['object'] else None
+                f_pose = ml_pool.submit(_check_posture, pose_estimator, frame) if current_controls['posture'] else None
+
+                face_data, gaze_data = f_face.result()
+                object_data = f_obj.result() if f_obj else []
+                is_suspicious_posture = f_pose.result() if f_pose else False
+                last_inference_time = frame_start
+            else:
+                # Honour modules switched off since the cached results were produced
+                object_data = object_data if current_controls['object'] else []
+                gaze_data = gaze_data if current_controls['gaze'] else []
+                is_suspicious_posture = is_suspicious_posture and current_controls['posture']
+
             is_sound_detected = audio_analyzer.is_sound_detected() if current_controls['audio'] else False
-            is_suspicious_posture = False
-            if current_controls['posture']:
-                _, landmarks = pose_estimator.find_pose(frame.copy(), draw=False)
-                if landmarks:
-                    lm_list = pose_estimator.get_landmark_positions(frame.shape, landmarks)
-                    is_suspicious_posture = pose_estimator.check_suspicious_posture(lm_list)
             
             alerts = generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is_sound_detected)
             
             # Handle alerts and database logging
+            snapshot_paths = []
             if alerts:
                 person_id = face_data[0]['id'] if face_data else 'N/A'
+                # This loop is the only producer, so a free slot now is still free after the loop.
+                # With the queue full the alerts are still logged, just without evidence.
+                evidence_slot = not snapshot_q.full()
                 for alert in alerts:
                     snapshot_path = None
-                    if alert.get('severity') == 'high':
+                    if alert.get('severity') == 'high' and evidence_slot:
+                        # Evidence is the raw frame, encoded and written by snapshot_writer_thread
                         filename = f"violation_{alert['type']}_{int(time.time())}_{uuid.uuid4().hex[:6]}.jpg"
-                        snapshot_path = os.path.join(VIOLATION_SNAPSHOTS_DIR, filename)
-                        try:
-                            cv2.imwrite(snapshot_path, frame)
-                            print(f"[EVIDENCE] Saved snapshot to {snapshot_path}")
-                            alert['details'] = alert.get('details', '') + f" | Evidence: {os.path.basename(snapshot_path)}"
-                        except Exception as e:
-                            print(f"[SNAPSHOT ERROR] Failed to save evidence: {e}")
+                        snapshot_path = str(VS_DIR / filename)
+                        snapshot_paths.append(snapshot_path)
+                        alert['details'] = alert.get('details', '') + f" | Evidence: {filename}"
                     
                     # Log violation to database (thread-safe)
-                    log_violation_thread_safe(alert, person_id, None)
+                    log_violation_thread_safe(alert, person_id, snapshot_path)
                     socketio.emit('new_alert', alert, namespace='/supervision')
+                if snapshot_paths:
+                    queue_evidence(frame, snapshot_paths)
 
             # Draw results and emit frame
             try:
-                # Create a local copy to draw on
-                display_frame = frame.copy()
+                # Draw on a pooled copy so the raw frame stays clean for the ML modules
+                display_frame = frame_emitter.acquire_buffer(frame)
+                np.copyto(display_frame, frame)
                 if face_data:
-                    # Draw face boxes
+                    # Draw face boxes, one polylines call per color
+                    known_boxes, unknown_boxes = [], []
                     for person in face_data:
-                        box = person['box']
+                        top, right, bottom, left = person['box']
                         name = person.get('name', 'Unknown')
-                        top, right, bottom, left = box
                         color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-                        cv2.rectangle(display_frame, (left, top), (right, bottom), color, 2)
+                        (known_boxes if name != "Unknown" else unknown_boxes).append((left, top, right, bottom))
                         cv2.putText(display_frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                    draw_boxes(display_frame, known_boxes, (0, 255, 0))
+                    draw_boxes(display_frame, unknown_boxes, (0, 0, 255))
                 
                 if object_data:
-                     for obj in object_data:
-                        box = obj['box']
-                        label = f"{obj['label']}"
-                        x1, y1, x2, y2 = box
-                        cv2.rectangle(display_frame, (x1, y1), (x2, y2), (255, 0, 0), 2)
-                        cv2.putText(display_frame, label, (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+                    draw_boxes(display_frame, [obj['box'] for obj in object_data], (255, 0, 0))
+                    for obj in object_data:
+                        x1, y1, _, _ = obj['box']
+                        cv2.putText(display_frame, obj['label'], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
 
                 if alerts:
                     cv2.putText(display_frame, "ALERT!", (10, 30), cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
 
-                _, buffer = cv2.imencode('.jpg', display_frame)
-                image_data = base64.b64encode(buffer).decode('utf-8')
                 new_frame_time = time.time()
                 fps = 1/(new_frame_time-prev_frame_time) if (new_frame_time-prev_frame_time)>0 else 0
                 prev_frame_time = new_frame_time
-                socketio.emit('video_frame', {
-                    'image': image_data, 'fps': int(fps), 'face_count': len(face_data),
+                frame_emitter.submit(display_frame, {
+                    'fps': int(fps), 'face_count': len(face_data),
                     'alerts_count': len(alerts)
-                }, namespace='/supervision')
+                })
             except Exception as e:
                 print(f"[FRAME EMISSION ERROR] {e}")
-            socketio.sleep(0.03)
+            pace_frame(frame_start, SUPERVISION_FRAME_INTERVAL)
 
         print("[DASHBOARD] Stop signal received. Cleaning up supervision resources...")
-        cap.release()
+        ml_pool.shutdown(wait=True)
+        frame_emitter.stop()
+        camera_broker.unsubscribe(camera)
         audio_analyzer.stop()
         print("[DASHBOARD] Supervision thread finished.")
         socketio.emit('supervision_stopped', namespace='/supervision')
@@ -252,73 +457,80 @@ def supervision_thread(app_context, stop_event):
 def attendance_thread(app_context, stop_event):
     """Background thread for marking attendance."""
     with app_context:
-        face_recognizer = FaceRecognizer()
-        log_file_path = os.path.join(ATTENDANCE_REPORTS_DIR, f"attendance_{datetime.date.today()}.csv")
-        todays_attendance = set()
-        
-        cap = None
+        face_recognizer = get_face_recognizer()
+        camera = None
+        attendance_log = None
+        frame_emitter = FrameEmitter('/attendance')
         try:
-            cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+            camera = camera_broker.subscribe()
+            if camera is None:
+                raise RuntimeError("Cannot open camera")
+            # Shared with run_attendance.py, so students marked by either one aren't marked again
+            attendance_log = AttendanceLog()
             while not stop_event.is_set():
-                ret, frame = cap.read()
-                if not ret: 
+                frame_start = time.monotonic()
+                frame = camera.get()
+                if frame is None:
                     continue
+                # Camera frames are shared with other namespaces, so draw on a copy
+                display_frame = frame_emitter.acquire_buffer(frame)
+                np.copyto(display_frame, frame)
                 
-                rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-                face_data = face_recognizer.recognize_faces(rgb_frame)
+                face_data = face_recognizer.recognize_faces(frame, color_order='bgr')
                 
                 for person in face_data:
                     student_id = person.get('id')
-                    if student_id != 'Unknown' and student_id not in todays_attendance:
+                    if student_id != 'Unknown' and student_id not in attendance_log:
                         timestamp_str = datetime.datetime.now().strftime('%H:%M:%S')
                         student_name = person.get('name')
-                        todays_attendance.add(student_id)
+                        attendance_log.mark(student_id, student_name, datetime.datetime.now().isoformat())
                         socketio.emit('attendance_update', {
                             'timestamp': timestamp_str, 
                             'name': student_name, 
                             'roll_number': student_id
                         }, namespace='/attendance')
-                        with open(log_file_path, 'a', newline='') as f:
-                            writer = csv.writer(f)
-                            writer.writerow([datetime.datetime.now().isoformat(), student_id, student_name])
                     
                     box = person['box']
                     top, right, bottom, left = box
-                    color = (255,165,0) if student_id in todays_attendance else ((0,255,0) if student_id != 'Unknown' else (0,0,255))
-                    cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
+                    color = (255,165,0) if student_id in attendance_log else ((0,255,0) if student_id != 'Unknown' else (0,0,255))
+                    cv2.rectangle(display_frame, (left, top), (right, bottom), color, 2)
 
-                _, buffer = cv2.imencode('.jpg', frame)
-                image_data = base64.b64encode(buffer).decode('utf-8')
-                socketio.emit('video_frame', {'image': image_data}, namespace='/attendance')
-                socketio.sleep(0.05)
+                frame_emitter.submit(display_frame)
+                pace_frame(frame_start, FEED_FRAME_INTERVAL)
         except Exception as e:
             print(f"Attendance thread error: {e}")
             socketio.emit('attendance_error', {'message': str(e)}, namespace='/attendance')
         finally:
-            if cap and cap.isOpened():
-                cap.release()
+            frame_emitter.stop()
+            if camera:
+                camera_broker.unsubscribe(camera)
+            if attendance_log:
+                attendance_log.close()
             print("Attendance thread stopped.")
 
 def register_thread(app_context, stop_event):
     """Background thread for the registration video feed."""
     with app_context:
-        cap = None
+        camera = None
         try:
-            cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+            camera = camera_broker.subscribe()
+            if camera is None:
+                raise RuntimeError("Cannot open camera")
             while not stop_event.is_set():
-                ret, frame = cap.read()
-                if not ret: 
+                frame_start = time.monotonic()
+                frame = camera.get()
+                if frame is None:
                     continue
-                _, buffer = cv2.imencode('.jpg', frame)
-                image_data = base64.b64encode(buffer).decode('utf-8')
+                _, buffer = cv2.imencode('.jpg', frame, JPEG_PARAMS)
+                image_data = buffer.tobytes()
                 socketio.emit('video_frame', {'image': image_data}, namespace='/register')
-                socketio.sleep(0.05)
+                pace_frame(frame_start, FEED_FRAME_INTERVAL)
         except Exception as e:
             print(f"Registration thread error: {e}")
             socketio.emit('registration_error', {'message': str(e)}, namespace='/register')
         finally:
-            if cap and cap.isOpened():
-                cap.release()
+            if camera:
+                camera_broker.unsubscribe(camera)
             print("Registration feed thread stopped.")
 
 # --- Flask Routes ---
@@ -328,7 +540,7 @@ def login():
         username = request.form['username']
         password = request.form['password']
         user = users.get(username)
-        if user and user.password == password:
+        if user and user.verify(password):
             login_user(user)
             return redirect(url_for('hub'))
         return render_template('login.html', error='Invalid credentials')
@@ -399,6 +611,7 @@ def supervision_disconnect():
 @socketio.on('update_controls', namespace='/supervision')
 def handle_update_controls(data):
     """Handles requests from an admin to toggle a detection module."""
+    global controls_snapshot
     if not current_user.is_authenticated or current_user.role != 'admin':
         print(f"Unauthorized control update attempt by {request.sid}")
         return
@@ -407,11 +620,13 @@ def handle_update_controls(data):
     enabled = data.get('enabled')
 
     with controls_lock:
-        if module in controls_state:
-            controls_state[module] = bool(enabled)
+        if module in controls_snapshot:
+            new_controls = dict(controls_snapshot)
+            new_controls[module] = bool(enabled)
+            controls_snapshot = new_controls
             print(f"[CONTROLS] Admin '{current_user.username}' updated '{module}' to {enabled}")
             # Broadcast the new state to ALL connected supervision clients
-            emit('controls_update', controls_state, namespace='/supervision', broadcast=True)    
+            emit('controls_update', new_controls, namespace='/supervision', broadcast=True)
 
 # Attendance Namespace
 @socketio.on('connect', namespace='/attendance')
@@ -439,33 +654,17 @@ def register_disconnect():
         stop_events['/register'].set()
     print("Registration client disconnected.")
 
-### NEW: Add this new handler for admin controls ###
-@socketio.on('update_controls', namespace='/supervision')
-def handle_update_controls(data):
-    """Handles requests from an admin to toggle a detection module."""
-    if not current_user.is_authenticated or current_user.role != 'admin':
-        print(f"Unauthorized control update attempt by {request.sid}")
-        return
-
-    module = data.get('module')
-    enabled = data.get('enabled')
-
-    with controls_lock:
-        if module in controls_state:
-            controls_state[module] = bool(enabled)
-            print(f"[CONTROLS] Admin '{current_user.username}' updated '{module}' to {enabled}")
-            # Broadcast the new state to ALL connected supervision clients
-            emit('controls_update', controls_state, namespace='/supervision', broadcast=True)
-### END NEW ###
-
 @socketio.on('register_face', namespace='/register')
 def handle_register_face(data):
     try:
-        face_recognizer = FaceRecognizer()
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
-        ret, frame = cap.read()
-        cap.release()
-        if ret:
+        face_recognizer = get_face_recognizer()
+        # Take one frame from the shared camera; it is already open while the register feed runs
+        camera = camera_broker.subscribe()
+        frame = None
+        if camera is not None:
+            frame = camera.get(timeout=2.0)
+            camera_broker.unsubscribe(camera)
+        if frame is not None:
             status_msg = face_recognizer.register_face(
                 {'name': data['name'], 'rollnumber': data['roll_number']},
                 frame
@@ -482,8 +681,9 @@ def handle_register_face(data):
 if __name__ == '__main__':
     print("[INFO] Starting Eagle Eye Command Center Server...")
     
-    os.makedirs(VIOLATION_SNAPSHOTS_DIR, exist_ok=True)
-    os.makedirs(ATTENDANCE_REPORTS_DIR, exist_ok=True)
+    from app.config import initialize_directories
+    initialize_directories()
+    configure_opencv()
     print(f"[INFO] Violation snapshots directory: {VIOLATION_SNAPSHOTS_DIR}")
     print(f"[INFO] Attendance reports directory: {ATTENDANCE_REPORTS_DIR}")
     
@@ -1,13 +1,28 @@
 # /app/database.py
 
-from sqlalchemy import create_engine, Column, Integer, String, DateTime, Text
+from sqlalchemy import create_engine, event, Column, Integer, String, DateTime, Text, Index
 from sqlalchemy.orm import declarative_base, sessionmaker
-from .config import DATABASE_URL
+from sqlalchemy.pool import NullPool
+from .config import DATABASE_URL, initialize_directories
 import datetime
 
 # Create a connection to the database. The 'check_same_thread=False'
 # is needed because we'll be accessing the DB from different parts of our app (Flask and main loop).
-engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False})
+# SQLite connections are cheap to open, so NullPool gives every session its own connection
+# instead of making bursty Socket.IO handlers wait on a fixed-size QueuePool.
+engine = create_engine(DATABASE_URL, connect_args={"check_same_thread": False}, poolclass=NullPool)
+
+@event.listens_for(engine, "connect")
+def _set_sqlite_pragmas(dbapi_connection, connection_record):
+    """
+    Switches every new SQLite connection to write-ahead logging. With WAL, commits become
+    appends to the log instead of full fsync'd rewrites, and readers don't block the writer.
+    """
+    cursor = dbapi_connection.cursor()
+    cursor.execute("PRAGMA journal_mode=WAL")
+    cursor.execute("PRAGMA synchronous=NORMAL")
+    cursor.execute("PRAGMA temp_store=MEMORY")
+    cursor.close()
 
 # A session is our "handle" to the database, allowing us to query it.
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
@@ -57,6 +72,9 @@ class Violation(Base):
     snapshot_path = Column(String) # Path to the evidence image
     details = Column(Text) # Extra details, like transcribed text
 
+# Reports filter violations by time window and student, so index both together
+Index('ix_viol_ts_sid', Violation.timestamp, Violation.student_id)
+
 def create_db_and_tables():
     """
     Creates the database and all the tables defined above.
@@ -107,5 +125,6 @@ def log_violation(session, alert_data, person_id='N/A', snapshot_path=None):
 # --- Example of how to use it (for testing later) ---
 if __name__ == "__main__":
     # If you run this file directly, it will create the database and tables.
+    initialize_directories()
     create_db_and_tables()
     print("Database setup complete. You can find 'eagle_eye.db' in the 'data' folder.")
\ No newline at end of file
@@ -1,18 +1,41 @@
 # /app/main.py
 
+import os
+
+# dlib (under face_recognition), numpy's BLAS and OpenCV use OpenMP, whose default of one
+# thread per core competes with OpenCV's pool and our own ML thread pools for the same
+# cores. OpenMP reads the variable once, when the first library loading it is imported,
+# so it must be set before any numeric import. A value already set in the environment wins.
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
 import cv2
 import time
+import logging
+import logging.handlers
+import queue
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 
 # Import our custom ML modules
-from .ml_models.face_detector import FaceRecognizer
+from .ml_models.face_detector import FaceRecognizer, DETECTION_BATCH_SIZE
 from .ml_models.object_detection import ObjectDetector
 from .ml_models.pose_estimation import PoseEstimator
 from .ml_models.gaze_tracking import GazeTracker
 from .ml_models.audio_analysis import AudioAnalyzer
 from .ml_models.alert_system import generate_alerts
+from .utils.helpers import FrameGrabber, LatestFrame, render_label, blit_label, DeferredQueueHandler, configure_opencv, open_camera
 
 # Import settings from our config file
-from .config import CAMERA_INDEX
+from .config import CAMERA_INDEX, DETECTION_SCALE, FACE_BATCH_DEADLINE, FACE_DETECT_EVERY
+
+# Alerts are written to the console by a QueueListener thread; the frame loop only queues them
+alert_log = logging.getLogger("eagleeye.alerts")
+alert_log.setLevel(logging.INFO)
+alert_log.propagate = False
+
+FPS_UPDATE_INTERVAL = 1.0  # Seconds between updates of the smoothed FPS readout
+FPS_FONT = (cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
 
 # --- Main Application Class ---
 
@@ -24,11 +47,28 @@ class EagleEyeApp:
     def __init__(self):
         """Initializes all the necessary ML models and starts audio analysis."""
         print("[INFO] Initializing Eagle Eye System...")
+        configure_opencv()
         self.face_recognizer = FaceRecognizer()
         self.object_detector = ObjectDetector()
         self.pose_estimator = PoseEstimator()
         self.gaze_tracker = GazeTracker()
         self.audio_analyzer = AudioAnalyzer()
+
+        # The vision modules are independent for a given frame and release the GIL inside
+        # their native code, so they run concurrently on this pool.
+        self.ml_pool = ThreadPoolExecutor(max_workers=4, thread_name_prefix="eagleeye-ml")
+
+        # Alert logging runs on its own thread so console I/O never stalls a frame
+        self.log_queue = queue.Queue(maxsize=1000)
+        console = logging.StreamHandler()
+        console.setFormatter(logging.Formatter("[%(asctime)s] ALERTS DETECTED: %(message)s", datefmt="%H:%M:%S"))
+        self.log_listener = logging.handlers.QueueListener(self.log_queue, console)
+        self.log_handler = DeferredQueueHandler(self.log_queue)
+        alert_log.addHandler(self.log_handler)
+        self.log_listener.start()
+
+        # The "ALERT!" banner never changes, so it is rasterized once here
+        self.alert_banner = render_label("ALERT!", cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 3)
         
         # Start the audio analyzer in a separate thread
         self.audio_analyzer.start()
@@ -37,66 +77,164 @@ class EagleEyeApp:
 
     def run(self):
         """
-        Starts the main application loop for video and audio processing.
+        Starts the live monitoring system. Capture, inference and display each get their
+        own thread, joined by "latest frame wins" slots: a FrameGrabber drains the camera,
+        an inference thread runs the models on the freshest frame, and the main thread only
+        shows results and handles the keyboard. Neither cap.read() nor cv2.waitKey() ever
+        blocks inference, and frames the models can't keep up with are dropped.
         """
         print("[INFO] Opening camera...")
-        cap = cv2.VideoCapture(CAMERA_INDEX)
+        cap = open_camera(CAMERA_INDEX)
         if not cap.isOpened():
             print(f"[ERROR] Cannot open camera with index {CAMERA_INDEX}. Exiting.")
             self.audio_analyzer.stop() # Ensure audio thread is stopped
             return
 
-        prev_frame_time = 0
+        grabber = FrameGrabber(cap).start()
+        display_slot = LatestFrame()
+        stop_event = threading.Event()
+        inference = threading.Thread(target=self.inference_loop, args=(grabber, display_slot, stop_event),
+                                     name="eagleeye-inference", daemon=True)
+        inference.start()
 
         print("[INFO] Starting live monitoring. Press 'q' to quit.")
-        
-        while True:
-            ret, frame = cap.read()
-            if not ret:
-                print("[ERROR] Failed to grab frame. Exiting.")
-                break
 
-            # --- Run all AI/ML Inference ---
-            
-            # 1. Vision Modules
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_data = self.face_recognizer.recognize_faces(rgb_frame)
-            object_data = self.object_detector.detect_objects(frame)
-            pose_frame, landmarks = self.pose_estimator.find_pose(frame.copy(), draw=False)
-            lm_list = self.pose_estimator.get_landmark_positions(frame.shape, landmarks)
-            is_suspicious_posture = self.pose_estimator.check_suspicious_posture(lm_list)
-            gaze_data = self.gaze_tracker.get_gaze_direction(frame)
-            
-            # 2. Audio Module
-            is_sound_detected = self.audio_analyzer.is_sound_detected()
-            
-            # 3. Alert Generation
-            alerts = generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is_sound_detected)
-            
-            # For now, just print alerts to the console
-            if alerts:
-                print(f"[{time.strftime('%H:%M:%S')}] ALERTS DETECTED: {alerts}")
-
-            # --- Drawing and Display ---
-            display_frame = self.draw_all_results(frame, face_data, object_data, gaze_data, alerts)
-
-            # Calculate and display FPS
-            new_frame_time = time.time()
-            fps = 1 / (new_frame_time - prev_frame_time)
-            prev_frame_time = new_frame_time
-            cv2.putText(display_frame, f"FPS: {int(fps)}", (10, 30), cv2.FONT_HERSHEY_SIMPLEX, 1, (255, 0, 255), 2)
-            
-            cv2.imshow("Eagle Eye - Live Monitoring", display_frame)
+        # The main thread only displays frames; HighGUI must stay on this thread
+        while not stop_event.is_set():
+            display_frame = display_slot.get(timeout=0.1)
+            if display_frame is not None:
+                cv2.imshow("Eagle Eye - Live Monitoring", display_frame)
 
             if cv2.waitKey(1) & 0xFF == ord('q'):
                 break
 
         # Cleanup
         print("[INFO] Shutting down system.")
+        stop_event.set()
+        inference.join()
+        grabber.stop()
         self.audio_analyzer.stop()
+        self.ml_pool.shutdown(wait=True)
+        self.log_listener.stop()
+        alert_log.removeHandler(self.log_handler)
         cap.release()
         cv2.destroyAllWindows()
 
+    def inference_loop(self, grabber, display_slot, stop_event):
+        """
+        Runs all models on frames from `grabber` and publishes the annotated frames to
+        `display_slot` until `stop_event` is set.
+
+        Frames are collected into small batches so that face detection runs once per batch
+        (see FaceRecognizer.detect_faces_batch). A batch is processed as soon as it is full
+        or its oldest frame has waited FACE_BATCH_DEADLINE seconds; with the HOG detector
+        the batch size is 1 and every frame is processed immediately.
+
+        Identity and gaze change slowly compared to the frame rate, so faces are only
+        detected on every FACE_DETECT_EVERY-th frame; process_frame reuses the last face
+        and gaze results on the frames in between.
+        """
+        self.fps_ema = 0.0
+        self.fps_label = None
+        self.fps_window_start = time.monotonic()
+        self.fps_window_frames = 0
+        self.face_data, self.gaze_data = [], []
+        pending_frames = deque()
+        batch_started = 0
+        frame_idx = 0
+
+        try:
+            while not stop_event.is_set():
+                frame = grabber.read(timeout=2.0)
+                if frame is None:
+                    print("[ERROR] Failed to grab frame. Exiting.")
+                    break
+
+                if not pending_frames:
+                    batch_started = time.time()
+                pending_frames.append(frame)
+                if len(pending_frames) < DETECTION_BATCH_SIZE and time.time() - batch_started < FACE_BATCH_DEADLINE:
+                    continue
+
+                frames = list(pending_frames)
+                pending_frames.clear()
+
+                # Faces are detected once per batch, on downscaled copies of the frames due
+                # for detection, and shared by recognition and gaze tracking; boxes come back
+                # at full resolution. The small frames stay BGR: no cvtColor pass is needed.
+                detect_idx = [i for i in range(len(frames)) if (frame_idx + i) % FACE_DETECT_EVERY == 0]
+                frame_idx += len(frames)
+                small_frames = {i: cv2.resize(frames[i], (0, 0), fx=DETECTION_SCALE, fy=DETECTION_SCALE)
+                                for i in detect_idx}
+                detections = {}
+                if detect_idx:
+                    detections = dict(zip(detect_idx, self.face_recognizer.detect_faces_batch([small_frames[i] for i in detect_idx], color_order='bgr')))
+
+                for i, frame in enumerate(frames):
+                    if i in detections:
+                        face_locations, face_landmarks_list = detections[i]
+                        display_slot.put(self.process_frame(frame, small_frames[i], face_locations, face_landmarks_list))
+                    else:
+                        display_slot.put(self.process_frame(frame))
+        finally:
+            # Let the display loop exit too if inference stopped on its own
+            stop_event.set()
+
+    def process_frame(self, frame, small_frame=None, face_locations=None, face_landmarks_list=None):
+        """
+        Runs the remaining AI/ML modules on one frame and returns the frame with all results
+        drawn on it. When the frame's faces were detected, recognition and gaze tracking run
+        on the downscaled BGR `small_frame` and their results are cached; without a detection
+        (small_frame is None) the cached face and gaze results are reused.
+        """
+        # --- Run all AI/ML Inference ---
+        
+        # 1. Vision Modules (in parallel; the frame time is set by the slowest one)
+        f_obj = self.ml_pool.submit(self.object_detector.detect_objects, frame)
+        f_pose = self.ml_pool.submit(self.check_posture, frame)
+        if small_frame is not None:
+            f_face = self.ml_pool.submit(self.face_recognizer.recognize_faces, small_frame, color_order='bgr', face_locations=face_locations, scale=1 / DETECTION_SCALE)
+            f_gaze = self.ml_pool.submit(self.gaze_tracker.get_gaze_direction, small_frame, face_locations, face_landmarks_list, scale=1 / DETECTION_SCALE)
+            self.face_data, self.gaze_data = f_face.result(), f_gaze.result()
+
+        face_data = self.face_data
+        gaze_data = self.gaze_data
+        object_data = f_obj.result()
+        is_suspicious_posture = f_pose.result()
+        
+        # 2. Audio Module
+        is_sound_detected = self.audio_analyzer.is_sound_detected()
+        
+        # 3. Alert Generation
+        alerts = generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is_sound_detected)
+        
+        # For now, just log alerts to the console (formatted and written off this thread)
+        if alerts:
+            alert_log.info("%s", alerts)
+
+        # --- Drawing and Display ---
+        display_frame = self.draw_all_results(frame, face_data, object_data, gaze_data, alerts)
+
+        # Calculate and display FPS. The reading is smoothed and only re-rendered once per
+        # FPS_UPDATE_INTERVAL; every other frame just stamps the cached label.
+        self.fps_window_frames += 1
+        now = time.monotonic()
+        elapsed = now - self.fps_window_start
+        if elapsed >= FPS_UPDATE_INTERVAL:
+            fps = self.fps_window_frames / elapsed
+            self.fps_ema = fps if self.fps_label is None else 0.9 * self.fps_ema + 0.1 * fps
+            self.fps_label = render_label(f"FPS: {int(self.fps_ema)}", *FPS_FONT)
+            self.fps_window_start, self.fps_window_frames = now, 0
+        if self.fps_label is not None:
+            blit_label(display_frame, self.fps_label, (10, 30))
+        return display_frame
+
+    def check_posture(self, frame):
+        """Returns True if the pose estimator flags a suspicious posture in the frame."""
+        pose_frame, landmarks = self.pose_estimator.find_pose(frame, draw=False)
+        lm_list = self.pose_estimator.get_landmark_positions(frame.shape, landmarks)
+        return self.pose_estimator.check_suspicious_posture(lm_list)
+
     def draw_all_results(self, frame, face_data, object_data, gaze_data, alerts):
         """
         A centralized function to draw all results and alerts onto the frame.
@@ -124,12 +262,12 @@ class EagleEyeApp:
         
         # Draw a general alert status on the top left
         if alerts:
-            alert_messages = [f"{alert['type']}: {alert['message']}" for alert in alerts]
             # Display first alert prominently
-            cv2.putText(frame, "ALERT!", (10, 60), cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 3)
-            cv2.putText(frame, alert_messages[0], (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
-            if len(alert_messages) > 1:
-                cv2.putText(frame, f"+ {len(alert_messages)-1} more", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+            blit_label(frame, self.alert_banner, (10, 60))
+            first_message = f"{alerts[0]['type']}: {alerts[0]['message']}"
+            cv2.putText(frame, first_message, (10, 90), cv2.FONT_HERSHEY_SIMPLEX, 0.6, (0, 0, 255), 2)
+            if len(alerts) > 1:
+                cv2.putText(frame, f"+ {len(alerts)-1} more", (10, 110), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
 
         return frame
 
@@ -0,0 +1,67 @@
+# /app/ml_models/_kernels.py
+
+# Small numeric kernels that run per face on every frame. With Numba installed they are
+# compiled to native loops (cached on disk after the first run); without it the
+# vectorized NumPy versions below are used, so Numba stays an optional speed-up.
+
+import numpy as np
+
+try:
+    from numba import njit
+    NUMBA_AVAILABLE = True
+except ImportError:
+    NUMBA_AVAILABLE = False
+
+if NUMBA_AVAILABLE:
+
+    @njit(cache=True, fastmath=True)
+    def gaze_ratios(left_eyes, right_eyes, nose_tips):
+        """
+        Ratio of the nose-to-left-eye and nose-to-right-eye distances of every face.
+
+        Args:
+            left_eyes, right_eyes: (F, 6, 2) arrays of eye landmark points.
+            nose_tips: An (F, 2) array with the bottom of each nose bridge.
+
+        Returns:
+            An (F,) float64 array of ratios (1.0 where the right distance is zero).
+        """
+        n_faces = left_eyes.shape[0]
+        ratios = np.ones(n_faces)
+        for f in range(n_faces):
+            lx = ly = rx = ry = 0.0
+            for p in range(6):
+                lx += left_eyes[f, p, 0]
+                ly += left_eyes[f, p, 1]
+                rx += right_eyes[f, p, 0]
+                ry += right_eyes[f, p, 1]
+            # Eye centers, truncated to whole pixels like the landmarks
+            dlx = nose_tips[f, 0] - int(lx / 6.0)
+            dly = nose_tips[f, 1] - int(ly / 6.0)
+            drx = nose_tips[f, 0] - int(rx / 6.0)
+            dry = nose_tips[f, 1] - int(ry / 6.0)
+            dist_right = np.sqrt(drx * drx + dry * dry)
+            if dist_right > 0:
+                ratios[f] = np.sqrt(dlx * dlx + dly * dly) / dist_right
+        return ratios
+
+else:
+
+    def gaze_ratios(left_eyes, right_eyes, nose_tips):
+        """
+        Ratio of the nose-to-left-eye and nose-to-right-eye distances of every face.
+
+        Args:
+            left_eyes, right_eyes: (F, 6, 2) arrays of eye landmark points.
+            nose_tips: An (F, 2) array with the bottom of each nose bridge.
+
+        Returns:
+            An (F,) float64 array of ratios (1.0 where the right distance is zero).
+        """
+        # Eye centers, truncated to whole pixels like the landmarks
+        left_centers = left_eyes.mean(axis=1).astype(int)
+        right_centers = right_eyes.mean(axis=1).astype(int)
+
+        dist_left = np.linalg.norm(nose_tips - left_centers, axis=1)
+        dist_right = np.linalg.norm(nose_tips - right_centers, axis=1)
+        return np.divide(dist_left, dist_right, out=np.ones_like(dist_left), where=dist_right > 0)
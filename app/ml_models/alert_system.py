@@ -2,6 +2,10 @@
 
 import datetime
 
+# Object labels that raise an alert. The detector only reports these classes today
+# (see TARGET_CLASSES in object_detection.py), but the alert rule doesn't rely on it.
+PROHIBITED_OBJECTS = frozenset({'cell phone'})
+
 def generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is_sound_detected):
     """
     Analyzes the data from all detection modules and generates a list of alerts.
@@ -9,7 +13,7 @@ def generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is
     Args:
         face_data (list): Data from FaceRecognizer.
         object_data (list): Data from ObjectDetector.
-        gaze_data (list): Data from GazeTracker.
+        gaze_data (list): Data from GazeTracker, or None if gaze wasn't analyzed.
         is_suspicious_posture (bool): Flag from PoseEstimator.
         is_sound_detected (bool): Flag from AudioAnalyzer.
 
@@ -19,20 +23,17 @@ def generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is
               Returns an empty list if no violations are found.
     """
     alerts = []
-    timestamp = datetime.datetime.now().isoformat()
 
     # Rule 1: No face detected or multiple faces
     # This is a high-priority alert.
     if not face_data:
         alerts.append({
-            'timestamp': timestamp,
             'type': 'Identity Alert',
             'message': 'No person detected in the frame.',
             'severity': 'high'
         })
     elif len(face_data) > 1:
         alerts.append({
-            'timestamp': timestamp,
             'type': 'Identity Alert',
             'message': f'Multiple people ({len(face_data)}) detected in the frame.',
             'severity': 'high'
@@ -43,58 +44,59 @@ def generate_alerts(face_data, object_data, gaze_data, is_suspicious_posture, is
         # For simplicity, we'll check general alerts against the first detected person.
         # A more advanced system could link objects/sounds to the closest person.
         person_id = face_data[0].get('id', 'Unknown')
+        details = f"Associated with person: {person_id}"
 
         # Rule 2: Unknown person detected
         if person_id == 'Unknown':
             alerts.append({
-                'timestamp': timestamp,
                 'type': 'Identity Alert',
                 'message': 'An unknown person has been detected.',
                 'severity': 'high'
             })
 
         # Rule 3: Prohibited object detected
-        if object_data:
-            for obj in object_data:
+        for obj in object_data:
+            if obj['label'] in PROHIBITED_OBJECTS:
                 alerts.append({
-                    'timestamp': timestamp,
                     'type': 'Object Alert',
                     'message': f"Prohibited object detected: {obj['label']}",
-                    'details': f"Associated with person: {person_id}",
+                    'details': details,
                     'severity': 'high'
                 })
 
         # Rule 4: Suspicious gaze detected
-        # We can check if any detected person is looking away.
-        for gaze in gaze_data:
-            if gaze['direction'] != 'Center':
-                alerts.append({
-                    'timestamp': timestamp,
-                    'type': 'Behavior Alert',
-                    'message': f"Suspicious gaze detected: {gaze['direction']}",
-                    'details': f"Associated with person: {person_id}",
-                    'severity': 'medium'
-                })
-                break # One gaze alert is enough
+        # One gaze alert is enough, so stop at the first person looking away.
+        looking_away = next((gaze for gaze in gaze_data or () if gaze['direction'] != 'Center'), None)
+        if looking_away is not None:
+            alerts.append({
+                'type': 'Behavior Alert',
+                'message': f"Suspicious gaze detected: {looking_away['direction']}",
+                'details': details,
+                'severity': 'medium'
+            })
 
         # Rule 5: Suspicious posture detected
         if is_suspicious_posture:
             alerts.append({
-                'timestamp': timestamp,
                 'type': 'Behavior Alert',
                 'message': 'Suspicious posture (e.g., head tilt) detected.',
-                'details': f"Associated with person: {person_id}",
+                'details': details,
                 'severity': 'medium'
             })
 
     # Rule 6: Continuous sound detected (General alert)
     if is_sound_detected:
         alerts.append({
-            'timestamp': timestamp,
             'type': 'Audio Alert',
             'message': 'Potential conversation or whisper detected.',
             'severity': 'low'
         })
+
+    # The clock is only read when there is something to stamp
+    if alerts:
+        timestamp = datetime.datetime.now().isoformat()
+        for alert in alerts:
+            alert['timestamp'] = timestamp
         
     return alerts
 
@@ -4,7 +4,6 @@ import pyaudio
 import numpy as np
 import threading
 import time
-from collections import deque
 
 class AudioAnalyzer:
     """
@@ -15,9 +14,9 @@ class AudioAnalyzer:
     FORMAT = pyaudio.paInt16  # Data format for the audio stream (16-bit integers)
     CHANNELS = 1              # Mono audio
     RATE = 44100              # Standard sample rate in Hz
-    CHUNK = 1024              # Number of audio frames per buffer
+    CHUNK = 2048              # Number of audio frames per buffer (~21 updates/s, plenty for a 2 s window)
 
-    def __init__(self, volume_threshold=500, silence_duration=2):
+    def __init__(self, volume_threshold=500, silence_duration=2, alert_cooldown=2):
         """
         Initializes the AudioAnalyzer.
 
@@ -25,42 +24,50 @@ class AudioAnalyzer:
             volume_threshold (int): The RMS amplitude threshold to consider as "sound".
                                     This value is empirical and may need tuning for your microphone.
             silence_duration (int): The number of seconds of continuous sound to trigger an alert.
+            alert_cooldown (float): Seconds a detection stays signaled before audio is
+                                    analyzed again. Chunks arriving meanwhile are skipped.
         """
         self.p = pyaudio.PyAudio()
         self.stream = None
         self.is_running = False
         self.volume_threshold = volume_threshold
         self.silence_duration = silence_duration
+        self.alert_cooldown = alert_cooldown
+        self._cooldown_until = 0.0
         
-        # A deque is a special list that has a maximum size. Old items are automatically
-        # discarded when new items are added, making it perfect for tracking recent audio levels.
-        # We'll store roughly `silence_duration` seconds of audio level history.
-        history_size = int(self.RATE / self.CHUNK * self.silence_duration)
-        self.volume_history = deque(maxlen=history_size)
+        # Sound counts as continuous once every chunk in the last `history_size` (roughly
+        # `silence_duration` seconds of audio) has been loud. The loud/quiet flags of that
+        # window are packed into the bits of one integer, newest in bit 0, so each chunk is a
+        # shift-and-mask and the check is a single compare against the all-ones mask.
+        self.history_size = int(self.RATE / self.CHUNK * self.silence_duration)
+        self._loud_bits = 0
+        self._window_mask = (1 << self.history_size) - 1
+        # Comparing mean squares against the squared threshold avoids a sqrt per chunk
+        self._threshold_sq = volume_threshold ** 2
         
         self.sound_detected = False
         print("[INFO] AudioAnalyzer initialized.")
 
     def _audio_callback(self, in_data, frame_count, time_info, status):
         """This is the function that gets called every time a new chunk of audio is ready."""
+        # While a detection is latched there is nothing new to learn from the audio
+        if time.monotonic() < self._cooldown_until:
+            return (in_data, pyaudio.paContinue)
+
         # Convert the raw byte data into an array of numbers
         audio_data = np.frombuffer(in_data, dtype=np.int16)
         
-        # Calculate the Root Mean Square (RMS) - a good measure of volume
-        rms = np.sqrt(np.mean(np.square(audio_data, dtype=np.float64)))
-        
-        # Add the current volume to our history
-        self.volume_history.append(rms)
+        # The mean square (RMS squared) is a good measure of volume. A 16-bit sample squared
+        # fits in int32, so there is no float64 copy of the chunk.
+        mean_square = np.square(audio_data, dtype=np.int32).mean()
         
-        # Check if the recent average volume is above the threshold
-        if len(self.volume_history) == self.volume_history.maxlen:
-            # Check if all recent readings are above the threshold
-            if all(v > self.volume_threshold for v in self.volume_history):
-                self.sound_detected = True
-            else:
-                self.sound_detected = False
-        else:
-            self.sound_detected = False
+        # Shift this chunk's flag into the window and drop the oldest one
+        loud = int(mean_square > self._threshold_sq)
+        self._loud_bits = ((self._loud_bits << 1) | loud) & self._window_mask
+
+        self.sound_detected = self._loud_bits == self._window_mask
+        if self.sound_detected:
+            self._cooldown_until = time.monotonic() + self.alert_cooldown
 
         return (in_data, pyaudio.paContinue)
 
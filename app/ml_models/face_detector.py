@@ -3,35 +3,122 @@
 import json
 import os
 import base64
+import sqlite3
+from contextlib import closing
 import numpy as np
+import dlib
 import face_recognition
-from scipy.spatial import distance as dist
+from face_recognition import api as face_recognition_api
 
 # Import settings from our centralized config file
-from ..config import ENCODINGS_DIR, FACE_DETECTION_MODEL, FACE_TOLERANCE, EYE_AR_THRESH
+from ..config import ENCODINGS_DIR, FACE_DETECTION_MODEL, FACE_DETECTION_UPSAMPLE, FACE_BATCH_SIZE, FACE_TOLERANCE, EYE_AR_THRESH
+from ..utils.helpers import scale_box
 
-# Define the path for the embeddings JSON file using the config
-EMBED_FILE = os.path.join(ENCODINGS_DIR, "embeddings.json")
+# Embeddings are stored in SQLite, one row per student with the raw float32 bytes, so a
+# registration or deletion writes a single row instead of rewriting the whole database
+EMBED_DB = os.path.join(ENCODINGS_DIR, "embeddings.db")
+# Earlier storage formats (an npz matrix, and before that base64 strings in JSON);
+# whichever exists is migrated into EMBED_DB on first load
+NPZ_EMBED_FILE = os.path.join(ENCODINGS_DIR, "embeddings.npz")
+LEGACY_EMBED_FILE = os.path.join(ENCODINGS_DIR, "embeddings.json")
 
 # --- Utility Functions ---
 
-def encode_embedding(emb):
-    """Encodes a face embedding into a base64 string for JSON storage."""
-    arr = np.array(emb, dtype=np.float32).tobytes()
-    return base64.b64encode(arr).decode("utf-8")
+def resolve_detection_model(model):
+    """
+    Resolves the 'auto' detection model setting. dlib's CNN detector is far more accurate
+    than HOG but only fast on a GPU, so it is picked only when dlib was built with CUDA and
+    a device is present; otherwise HOG is used. Explicit 'hog'/'cnn' are returned unchanged.
+    """
+    if model != 'auto':
+        return model
+    try:
+        if dlib.DLIB_USE_CUDA and dlib.cuda.get_num_devices() > 0:
+            return 'cnn'
+    except (AttributeError, RuntimeError):
+        pass
+    return 'hog'
+
+DETECTION_MODEL = resolve_detection_model(FACE_DETECTION_MODEL)
+# Only the CNN detector gains from batching; there frames share one GPU forward pass.
+DETECTION_BATCH_SIZE = FACE_BATCH_SIZE if DETECTION_MODEL == 'cnn' else 1
+
+# --- Channel order ---
+# OpenCV frames are BGR while dlib's models expect RGB, but only the CNN detector and the
+# descriptor network actually look at color. dlib's HOG detector takes the strongest
+# gradient over all channels and its shape predictors work on (r+g+b)/3 intensity, so both
+# give identical results in either order. BGR frames are therefore never converted as a
+# whole: only the 150x150 face chips are channel-swapped before encoding.
+
+def locate_faces(frame, color_order='rgb', upsample=FACE_DETECTION_UPSAMPLE):
+    """Runs the face detector on an RGB or BGR frame, returning (top, right, bottom, left) boxes."""
+    if color_order == 'bgr' and DETECTION_MODEL == 'cnn':
+        frame = np.ascontiguousarray(frame[:, :, ::-1])
+    return face_recognition.face_locations(frame, number_of_times_to_upsample=upsample, model=DETECTION_MODEL)
+
+def encode_faces(frame, face_locations, color_order='rgb'):
+    """
+    Computes the 128-d descriptors of all faces in a frame with one call into dlib's ResNet.
+    `face_recognition.face_encodings` runs the network once per face; here the aligned faces
+    go through as a single batch. Uses the same 5-point alignment and chip padding, so the
+    descriptors match the ones stored at registration.
+
+    Args:
+        frame: The image frame (as a numpy array).
+        face_locations (list): Face boxes as (top, right, bottom, left) tuples.
+        color_order (str): Channel order of `frame`, either 'rgb' or 'bgr'.
+
+    Returns:
+        An (F, 128) float32 array, one row per box.
+    """
+    shapes = dlib.full_object_detections()
+    for top, right, bottom, left in face_locations:
+        shapes.append(face_recognition_api.pose_predictor_5_point(frame, dlib.rectangle(left, top, right, bottom)))
+    chips = dlib.get_face_chips(frame, shapes, size=150, padding=0.25)
+    if color_order == 'bgr':
+        chips = [np.ascontiguousarray(chip[:, :, ::-1]) for chip in chips]
+    descriptors = face_recognition_api.face_encoder.compute_face_descriptor(chips)
+    return np.asarray(descriptors, dtype=np.float32)
 
-def decode_embedding(s):
-    """Decodes a base64 string back into a numpy array for comparison."""
-    arr = np.frombuffer(base64.b64decode(s), dtype=np.float32)
-    return arr
+def _empty_matrix():
+    """Returns an embedding matrix with no rows."""
+    return np.empty((0, 128), dtype=np.float32)
 
-def eye_aspect_ratio(eye):
-    """Computes the eye aspect ratio (EAR) to determine if an eye is closed."""
-    A = dist.euclidean(eye[1], eye[5])
-    B = dist.euclidean(eye[2], eye[4])
-    C = dist.euclidean(eye[0], eye[3])
-    ear = (A + B) / (2.0 * C)
-    return ear
+def connect_embeddings_db():
+    """Opens the embeddings database, creating it and its table if needed."""
+    os.makedirs(ENCODINGS_DIR, exist_ok=True)
+    conn = sqlite3.connect(EMBED_DB)
+    conn.execute(
+        "CREATE TABLE IF NOT EXISTS faces ("
+        "rollnumber TEXT PRIMARY KEY, name TEXT NOT NULL, embedding BLOB NOT NULL)"
+    )
+    return conn
+
+def load_npz_embeddings(path):
+    """
+    Reads the npz database (ids, names and an (N, 128) 'emb' matrix).
+
+    Returns:
+        A tuple (ids, names, matrix).
+    """
+    with np.load(path) as data:
+        return data['ids'].tolist(), data['names'].tolist(), data['emb'].astype(np.float32, copy=False)
+
+def load_legacy_embeddings(path):
+    """
+    Reads the old JSON database, where each embedding was a base64 string.
+
+    Returns:
+        A tuple (ids, names, matrix).
+    """
+    with open(path, "r") as f:
+        db = json.load(f)
+    ids = list(db.keys())
+    names = [db[sid]['name'] for sid in ids]
+    if not ids:
+        return ids, names, _empty_matrix()
+    matrix = np.stack([np.frombuffer(base64.b64decode(db[sid]['embedding']), dtype=np.float32) for sid in ids])
+    return ids, names, matrix
 
 # --- Main Recognizer Class ---
 
@@ -40,30 +127,73 @@ class FaceRecognizer:
     A class to handle all face recognition, liveness detection, and database management.
     """
     def __init__(self):
-        """Initializes the recognizer by loading the known faces from the JSON file."""
-        self.db = self._load_db()
-        print(f"[INFO] FaceRecognizer initialized. {len(self.db)} known faces loaded.")
+        """Initializes the recognizer by loading the known faces from the embeddings database."""
+        self._set_index(*self._load_db())
+        print(f"[INFO] FaceRecognizer initialized ({DETECTION_MODEL} detector). {len(self.db)} known faces loaded.")
 
     def _load_db(self):
-        """Loads the student database from the embeddings JSON file."""
-        if not os.path.exists(EMBED_FILE):
-            return {}
-        with open(EMBED_FILE, "r") as f:
+        """
+        Loads the student database from the embeddings database, migrating an older
+        npz or JSON file if that is all there is.
+
+        Returns:
+            A tuple (ids, names, matrix), where row i of the (N, 128) matrix belongs to ids[i].
+        """
+        if not os.path.exists(EMBED_DB):
+            return self._migrate_old_db()
+        try:
+            with closing(connect_embeddings_db()) as conn:
+                rows = conn.execute("SELECT rollnumber, name, embedding FROM faces ORDER BY rowid").fetchall()
+        except sqlite3.DatabaseError:
+            print(f"[WARNING] Could not read {EMBED_DB}. Starting with an empty database.")
+            return [], [], _empty_matrix()
+        ids = [row[0] for row in rows]
+        names = [row[1] for row in rows]
+        # One buffer for all rows; the index is never modified in place, so read-only is fine
+        matrix = np.frombuffer(b"".join(row[2] for row in rows), dtype=np.float32).reshape(-1, 128)
+        return ids, names, matrix
+
+    def _migrate_old_db(self):
+        """Moves faces from an npz or JSON file written by an older version into EMBED_DB."""
+        for path, loader in ((NPZ_EMBED_FILE, load_npz_embeddings), (LEGACY_EMBED_FILE, load_legacy_embeddings)):
+            if not os.path.exists(path):
+                continue
             try:
-                return json.load(f)
-            except json.JSONDecodeError:
-                return {}
+                ids, names, matrix = loader(path)
+            except (OSError, ValueError, KeyError):
+                # json.JSONDecodeError is a ValueError
+                print(f"[WARNING] Could not read {path}. Starting with an empty database.")
+                return [], [], _empty_matrix()
+            with closing(connect_embeddings_db()) as conn, conn:
+                conn.executemany(
+                    "INSERT OR REPLACE INTO faces VALUES (?, ?, ?)",
+                    [(sid, name, emb.tobytes()) for sid, name, emb in zip(ids, names, matrix)],
+                )
+            print(f"[INFO] Migrated {len(ids)} faces from {path} to {EMBED_DB}.")
+            return ids, names, matrix
+        return [], [], _empty_matrix()
+
+    def _set_index(self, ids, names, matrix):
+        """
+        Publishes a new version of the database. Matching reads `_known_index` as one tuple,
+        so ids, names and matrix are always seen together even while another thread
+        registers or deletes a student. `db` keeps the name/roll-number lookup. The squared
+        norm of every embedding is cached with them for the dot-product distance in
+        `recognize_faces`.
+        """
+        self._known_index = (ids, names, matrix, np.einsum('ij,ij->i', matrix, matrix))
+        self.db = {sid: {"name": name, "rollnumber": sid} for sid, name in zip(ids, names)}
 
-    def _save_db(self):
-        """Saves the current student database to the embeddings JSON file."""
-        with open(EMBED_FILE, "w") as f:
-            json.dump(self.db, f, indent=2)
+    def _write_db(self, sql, params):
+        """Runs one write statement against the embeddings database in its own transaction."""
+        with closing(connect_embeddings_db()) as conn, conn:
+            conn.execute(sql, params)
 
     def register_face(self, student_info, face_img):
         """
         Registers a new student's face. This is called by the registration utility.
         """
-        face_locations = face_recognition.face_locations(face_img, number_of_times_to_upsample=2, model=FACE_DETECTION_MODEL)
+        face_locations = face_recognition.face_locations(face_img, number_of_times_to_upsample=2, model=DETECTION_MODEL)
         
         if not face_locations:
             return "Registration failed: No face could be detected in the image."
@@ -72,51 +202,103 @@ class FaceRecognizer:
 
         face_encoding = face_recognition.face_encodings(face_img, known_face_locations=face_locations)[0]
 
-        for entry in self.db.values():
-            known_encoding = decode_embedding(entry['embedding'])
-            if face_recognition.compare_faces([known_encoding], face_encoding, tolerance=FACE_TOLERANCE)[0]:
-                return f"Registration failed: Face is too similar to {entry['name']} ({entry['rollnumber']})."
+        ids, names, matrix, _ = self._known_index
+        if ids:
+            dists = np.linalg.norm(matrix - face_encoding, axis=1)
+            closest = int(dists.argmin())
+            if dists[closest] <= FACE_TOLERANCE:
+                return f"Registration failed: Face is too similar to {names[closest]} ({ids[closest]})."
 
         sid = student_info["rollnumber"]
-        self.db[sid] = {
-            "name": student_info["name"],
-            "rollnumber": sid,
-            "embedding": encode_embedding(face_encoding),
-        }
-        self._save_db()
+        face_encoding = np.asarray(face_encoding, dtype=np.float32)
+        if sid in self.db:
+            # Re-registering a roll number replaces its embedding
+            row = ids.index(sid)
+            names, matrix = list(names), matrix.copy()
+            names[row], matrix[row] = student_info["name"], face_encoding
+        else:
+            ids, names = ids + [sid], names + [student_info["name"]]
+            matrix = np.concatenate([matrix, face_encoding[None, :]])
+        self._write_db("INSERT OR REPLACE INTO faces VALUES (?, ?, ?)", (sid, student_info["name"], face_encoding.tobytes()))
+        self._set_index(ids, names, matrix)
         return f"Success! {student_info['name']} has been registered."
 
-    def recognize_faces(self, frame):
+    def detect_faces(self, frame, color_order='rgb'):
+        """
+        Finds the faces and their facial landmarks in an RGB or BGR frame. Detection is the most
+        expensive step of the pipeline, so callers run it once and pass the results to both
+        `recognize_faces` and `GazeTracker.get_gaze_direction`.
+
+        Live callers pass a frame downscaled by DETECTION_SCALE. The detector still upsamples
+        it FACE_DETECTION_UPSAMPLE times, as the baseline did on full frames, so faces down to
+        ~80 px at camera resolution are found at a quarter of the baseline's cost. The results
+        are in the coordinates of `frame`.
+
+        Returns:
+            A tuple (face_locations, face_landmarks_list).
+        """
+        face_locations = locate_faces(frame, color_order)
+        face_landmarks_list = face_recognition.face_landmarks(frame, face_locations)
+        return face_locations, face_landmarks_list
+
+    def detect_faces_batch(self, frames, color_order='rgb'):
+        """
+        Runs `detect_faces` over several frames of the same size. With the CNN detector the
+        frames are detected in one batched GPU call; with HOG they are detected one by one.
+
+        Returns:
+            A list with one (face_locations, face_landmarks_list) tuple per frame.
+        """
+        if DETECTION_MODEL != 'cnn' or len(frames) == 1:
+            return [self.detect_faces(frame, color_order) for frame in frames]
+        rgb_frames = [np.ascontiguousarray(f[:, :, ::-1]) for f in frames] if color_order == 'bgr' else frames
+        batch_locations = face_recognition.batch_face_locations(rgb_frames, number_of_times_to_upsample=FACE_DETECTION_UPSAMPLE, batch_size=len(frames))
+        return [(face_locations, face_recognition.face_landmarks(frame, face_locations))
+                for frame, face_locations in zip(frames, batch_locations)]
+
+    def recognize_faces(self, frame, color_order='rgb', face_locations=None, scale=1):
         """
         Recognizes all known faces in a given frame and performs liveness detection.
+
+        Args:
+            frame: The image frame (as a numpy array) to process.
+            color_order (str): Channel order of `frame`, either 'rgb' or 'bgr'. BGR frames
+                               straight from OpenCV need no cv2.cvtColor pass; only the
+                               face chips are channel-swapped.
+            face_locations (list, optional): Face boxes already found by `detect_faces`.
+                                             When omitted, faces are detected here.
+            scale (float): Multiplier applied to the returned boxes, e.g. 1 / DETECTION_SCALE
+                           when `frame` is a downscaled copy of the camera frame.
         """
-        face_locations = face_recognition.face_locations(frame, number_of_times_to_upsample=1, model=FACE_DETECTION_MODEL)
+        if face_locations is None:
+            face_locations = locate_faces(frame, color_order)
         
-        if not face_locations or not self.db:
+        known_ids, known_names, known_matrix, known_sq_norms = self._known_index
+        if not face_locations or not known_ids:
             return []
 
-        face_encodings = face_recognition.face_encodings(frame, face_locations)
-        face_landmarks_list = face_recognition.face_landmarks(frame, face_locations)
-        
-        known_encodings = [decode_embedding(entry['embedding']) for entry in self.db.values()]
-        known_student_ids = list(self.db.keys())
+        face_encodings = encode_faces(frame, face_locations, color_order)
+
+        # Squared distances from every face in the frame to every known face, (F, N), as
+        # |a|^2 + |b|^2 - 2ab: one matrix product instead of an (F, N, 128) difference array
+        sq_dists = known_sq_norms[None, :] - 2.0 * (face_encodings @ known_matrix.T)
+        best = sq_dists.argmin(axis=1)
+        best_sq = sq_dists[np.arange(len(best)), best] + np.einsum('ij,ij->i', face_encodings, face_encodings)
+        matched = best_sq <= FACE_TOLERANCE ** 2
 
         recognized_students = []
-        for i, face_encoding in enumerate(face_encodings):
-            matches = face_recognition.compare_faces(known_encodings, face_encoding, tolerance=FACE_TOLERANCE)
-            
+        for i in range(len(face_encodings)):
             student_id = "Unknown"
             name = "Unknown"
             
-            if True in matches:
-                first_match_index = matches.index(True)
-                student_id = known_student_ids[first_match_index]
-                name = self.db[student_id]['name']
+            if matched[i]:
+                student_id = known_ids[best[i]]
+                name = known_names[best[i]]
 
             recognized_students.append({
                 'id': student_id,
                 'name': name,
-                'box': face_locations[i]
+                'box': scale_box(face_locations[i], scale) if scale != 1 else face_locations[i]
             })
 
         return recognized_students
@@ -127,11 +309,15 @@ class FaceRecognizer:
 
     def delete_student(self, rollnumber):
         """Deletes a student from the database by their roll number."""
-        if rollnumber in self.db:
-            self.db.pop(rollnumber)
-            self._save_db()
-            return True
-        return False
+        if rollnumber not in self.db:
+            return False
+        ids, names, matrix, _ = self._known_index
+        row = ids.index(rollnumber)
+        ids, names = ids[:row] + ids[row + 1:], names[:row] + names[row + 1:]
+        matrix = np.delete(matrix, row, axis=0)
+        self._write_db("DELETE FROM faces WHERE rollnumber = ?", (rollnumber,))
+        self._set_index(ids, names, matrix)
+        return True
 
 
 # ----------just for testing independently----------------
@@ -6,6 +6,28 @@ import numpy as np
 # We can reuse the face_recognition library to get landmarks, as it's already a dependency.
 import face_recognition
 
+from ..utils.helpers import scale_box
+from ._kernels import gaze_ratios
+
+# Gaze directions, indexed by the codes returned from `gaze_codes`
+GAZE_CENTER, GAZE_LEFT, GAZE_RIGHT = 0, 1, 2
+GAZE_DIRECTIONS = ("Center", "Looking Left", "Looking Right")
+
+# Thresholds on the nose-to-left-eye / nose-to-right-eye distance ratio.
+# A ratio of ~1.0 means looking forward.
+# A ratio > 1.0 means turning right (left eye appears closer to nose).
+# A ratio < 1.0 means turning left (right eye appears closer to nose).
+# These thresholds can be tuned for sensitivity.
+RIGHT_RATIO_THRESH = 1.35
+LEFT_RATIO_THRESH = 0.75
+
+def gaze_codes(ratios):
+    """Maps gaze ratios to GAZE_CENTER / GAZE_LEFT / GAZE_RIGHT codes (an int8 array)."""
+    codes = np.full(len(ratios), GAZE_CENTER, dtype=np.int8)
+    codes[ratios > RIGHT_RATIO_THRESH] = GAZE_RIGHT
+    codes[ratios < LEFT_RATIO_THRESH] = GAZE_LEFT
+    return codes
+
 class GazeTracker:
     """
     A class to estimate gaze direction based on facial landmarks.
@@ -15,62 +37,50 @@ class GazeTracker:
         """Initializes the GazeTracker."""
         print("[INFO] GazeTracker initialized.")
 
-    def get_gaze_direction(self, frame):
+    def get_gaze_direction(self, frame, face_locations=None, face_landmarks_list=None, scale=1):
         """
         Estimates the gaze direction for all faces in a frame.
 
         Args:
-            frame: The image frame (as a numpy array) to process.
+            frame: The RGB or BGR image frame (as a numpy array) to process. Only landmark
+                   positions are used, which don't depend on the channel order.
+            face_locations (list, optional): Face boxes already found by `FaceRecognizer.detect_faces`.
+            face_landmarks_list (list, optional): The matching facial landmarks.
+                                                  Anything not supplied is computed here.
+            scale (float): Multiplier applied to the returned boxes, e.g. 1 / DETECTION_SCALE
+                           when `frame` is a downscaled copy of the camera frame.
 
         Returns:
             A list of dictionaries, one for each detected face, containing the gaze direction.
             Example: [{'box': (x1, y1, x2, y2), 'direction': 'Center'}]
         """
-        # First, find all faces and their landmarks in the frame.
-        # This is a bit redundant if main.py already does it, but it keeps the module independent.
-        # We can optimize this later by passing landmarks directly.
-        face_locations = face_recognition.face_locations(frame)
-        face_landmarks_list = face_recognition.face_landmarks(frame, face_locations)
+        # Reuse the detection from FaceRecognizer when the caller has it, so faces aren't
+        # detected twice per frame. Standalone use still works without it.
+        if face_locations is None:
+            face_locations = face_recognition.face_locations(frame)
+        if face_landmarks_list is None:
+            face_landmarks_list = face_recognition.face_landmarks(frame, face_locations)
 
-        gaze_results = []
+        if not face_landmarks_list:
+            return []
+
+        # Get the coordinates for the left and right eyes, and the nose tip, of every face
+        # as contiguous arrays so all faces are scored in one vectorized pass.
+        # These landmarks are used to estimate the head's horizontal orientation.
+        left_eyes = np.array([lm['left_eye'] for lm in face_landmarks_list])      # (F, 6, 2)
+        right_eyes = np.array([lm['right_eye'] for lm in face_landmarks_list])    # (F, 6, 2)
+        nose_tips = np.array([lm['nose_bridge'][-1] for lm in face_landmarks_list]) # (F, 2), bottom of the nose bridge
 
-        for i, face_landmarks in enumerate(face_landmarks_list):
-            # Get the coordinates for the left and right eyes, and the nose tip.
-            # These landmarks are used to estimate the head's horizontal orientation.
-            left_eye = np.array(face_landmarks['left_eye'])
-            right_eye = np.array(face_landmarks['right_eye'])
-            nose_tip = np.array(face_landmarks['nose_bridge'][-1]) # The bottom of the nose bridge
-
-            # Calculate the center point of each eye
-            left_eye_center = left_eye.mean(axis=0).astype(int)
-            right_eye_center = right_eye.mean(axis=0).astype(int)
-
-            # Calculate the horizontal distance from the nose tip to the center of each eye.
-            dist_nose_to_left_eye = np.linalg.norm(nose_tip - left_eye_center)
-            dist_nose_to_right_eye = np.linalg.norm(nose_tip - right_eye_center)
-
-            # Calculate the ratio of the distances.
-            # A ratio of ~1.0 means looking forward.
-            # A ratio > 1.0 means turning right (left eye appears closer to nose).
-            # A ratio < 1.0 means turning left (right eye appears closer to nose).
-            if dist_nose_to_right_eye > 0:
-                ratio = dist_nose_to_left_eye / dist_nose_to_right_eye
-            else:
-                ratio = 1.0 # Avoid division by zero
-
-            direction = "Center"
-            # These thresholds can be tuned for sensitivity.
-            if ratio > 1.35:
-                direction = "Looking Right"
-            elif ratio < 0.75:
-                direction = "Looking Left"
-
-            # Get the bounding box for this face
-            top, right, bottom, left = face_locations[i]
+        codes = gaze_codes(gaze_ratios(left_eyes, right_eyes, nose_tips))
+
+        gaze_results = []
+        for i, code in enumerate(codes):
+            # Get the bounding box for this face, in the caller's frame coordinates
+            box = scale_box(face_locations[i], scale) if scale != 1 else face_locations[i]
 
             gaze_results.append({
-                'box': (top, right, bottom, left),
-                'direction': direction
+                'box': box,
+                'direction': GAZE_DIRECTIONS[code]
             })
 
         return gaze_results
@@ -1,34 +1,127 @@
 # /app/ml_models/pose_estimation.py
 
+import os
+import shutil
+import time
+import urllib.request
 import cv2
 import mediapipe as mp
 import numpy as np
 
+from ..config import MODELS_DIR
+
+# --- Constants ---
+# Pose landmarker bundles for the Tasks API, indexed by model_complexity (0 = lite, the fastest)
+POSE_MODEL_VARIANTS = ('lite', 'full', 'heavy')
+POSE_MODEL_URL = "https://storage.googleapis.com/mediapipe-models/pose_landmarker/pose_landmarker_{0}/float16/latest/pose_landmarker_{0}.task"
+POSE_DOWNLOAD_TIMEOUT = 10  # Seconds; offline machines give up quickly and use the legacy solution
+
+# Variants whose download already failed in this session; they aren't retried
+_failed_downloads = set()
+
+def pose_model_path(variant):
+    """
+    Returns the .task bundle for a pose landmarker variant from MODELS_DIR. Offline exam
+    machines must have it copied there (see the README); otherwise it is downloaded on
+    first use. A failed download is remembered, so later estimators fall back at once
+    instead of waiting for the timeout again.
+
+    Raises:
+        OSError: If the bundle isn't cached and can't be downloaded within POSE_DOWNLOAD_TIMEOUT.
+    """
+    path = os.path.join(MODELS_DIR, f"pose_landmarker_{variant}.task")
+    if not os.path.exists(path):
+        if variant in _failed_downloads:
+            raise OSError(f"pose landmarker ({variant}) is not in {MODELS_DIR} and its download failed earlier")
+        print(f"[INFO] Downloading the MediaPipe pose landmarker ({variant}). This only happens once...")
+        os.makedirs(MODELS_DIR, exist_ok=True)
+        partial_path = path + '.part'
+        try:
+            with urllib.request.urlopen(POSE_MODEL_URL.format(variant), timeout=POSE_DOWNLOAD_TIMEOUT) as response, \
+                    open(partial_path, 'wb') as f:
+                shutil.copyfileobj(response, f)
+        except OSError:
+            _failed_downloads.add(variant)
+            if os.path.exists(partial_path):
+                os.remove(partial_path)
+            raise
+        os.replace(partial_path, path)
+    return path
+
+def draw_pose(frame, points, connections):
+    """
+    Draws a pose skeleton on `frame` in place with two polylines calls.
+
+    Args:
+        frame: The BGR frame to draw on.
+        points: An (N, 2) int32 array of landmark pixel positions.
+        connections: A (K, 2) array of landmark index pairs to join with lines.
+    """
+    # Every connection becomes a 2-point segment: (K, 2, 2)
+    cv2.polylines(frame, points[connections], False, (0, 255, 0), 2)
+    # A closed single-point polyline with a thick pen is drawn as a round dot
+    # (OpenCV skips open polylines that have only one point)
+    cv2.polylines(frame, points[:, None, :], True, (255, 0, 255), 4)
+
 class PoseEstimator:
     """
     A class to handle pose estimation using MediaPipe.
     """
-    def __init__(self, static_mode=False, model_complexity=1, min_detection_confidence=0.5, min_tracking_confidence=0.5):
+    def __init__(self, static_mode=False, model_complexity=0, min_detection_confidence=0.5, min_tracking_confidence=0.5):
         """
         Initializes the pose estimator with MediaPipe.
 
+        The Tasks API PoseLandmarker is used when its model bundle is available. In video
+        mode it runs with `detect_for_video`, which tracks the body between frames and
+        returns the landmarks of the frame it was given, even when callers skip frames.
+        If the bundle can't be loaded or downloaded, or the landmarker can't be created,
+        the legacy `mp.solutions.pose` solution is used.
+
         Args:
             static_mode (bool): If True, treats the input images as a batch of static, possibly unrelated images.
                                 If False, treats them as a video stream.
             model_complexity (int): Complexity of the pose landmark model: 0, 1, or 2.
-                                    We use 1 as a balance between accuracy and speed for our CPU.
+                                    We use 0 (lite), which is about twice as fast as 1 on our CPU.
             min_detection_confidence (float): Minimum confidence value for the detection to be considered successful.
             min_tracking_confidence (float): Minimum confidence value for the landmark tracking to be considered successful.
         """
+        # The legacy module still provides the landmark indices and skeleton connections
         self.mp_pose = mp.solutions.pose
-        self.pose = self.mp_pose.Pose(
-            static_image_mode=static_mode,
-            model_complexity=model_complexity,
-            min_detection_confidence=min_detection_confidence,
-            min_tracking_confidence=min_tracking_confidence
-        )
-        self.mp_drawing = mp.solutions.drawing_utils
-        print("[INFO] PoseEstimator initialized with MediaPipe.")
+        # (K, 2) landmark index pairs, so the whole skeleton can be drawn with one polylines call
+        self._connections = np.array(sorted(self.mp_pose.POSE_CONNECTIONS), dtype=np.int32)
+        self.static_mode = static_mode
+        self.results = None
+        self._last_timestamp_ms = -1
+        # Reused RGB buffer for find_pose; reallocated only when the frame size changes
+        self._rgb_buf = None
+        try:
+            vision = mp.tasks.vision
+            options = vision.PoseLandmarkerOptions(
+                base_options=mp.tasks.BaseOptions(model_asset_path=pose_model_path(POSE_MODEL_VARIANTS[model_complexity])),
+                running_mode=vision.RunningMode.IMAGE if static_mode else vision.RunningMode.VIDEO,
+                num_poses=1,
+                min_pose_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence
+            )
+            self.landmarker = vision.PoseLandmarker.create_from_options(options)
+            self.pose = None
+            backend = "Tasks PoseLandmarker"
+        except Exception as e:
+            print(f"[WARNING] Could not create the MediaPipe pose landmarker: {e}. Using the legacy pose solution.")
+            self.landmarker = None
+            self.pose = self.mp_pose.Pose(
+                static_image_mode=static_mode,
+                model_complexity=model_complexity,
+                min_detection_confidence=min_detection_confidence,
+                min_tracking_confidence=min_tracking_confidence
+            )
+            backend = "legacy solution"
+        print(f"[INFO] PoseEstimator initialized with MediaPipe ({backend}).")
+
+    def _next_timestamp_ms(self):
+        """Video-mode timestamps must strictly increase, even for frames in the same millisecond."""
+        self._last_timestamp_ms = max(time.monotonic_ns() // 1_000_000, self._last_timestamp_ms + 1)
+        return self._last_timestamp_ms
 
     def find_pose(self, frame, draw=True):
         """
@@ -37,29 +130,50 @@ class PoseEstimator:
         Args:
             frame: The image frame (as a numpy array) to process.
             draw (bool): If True, draws the landmarks and connections on the frame.
+                         With draw=False the frame is only read, so callers can pass
+                         it without making a copy.
 
         Returns:
             A tuple containing:
             - The frame with landmarks drawn on it (if draw=True).
-            - The list of detected landmarks.
+            - The detected landmarks (None if no pose was found).
         """
         # MediaPipe works with RGB images, so we convert from BGR (OpenCV's default)
-        frame_rgb = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-        
+        if self._rgb_buf is None or self._rgb_buf.shape != frame.shape:
+            self._rgb_buf = np.empty_like(frame)
+        cv2.cvtColor(frame, cv2.COLOR_BGR2RGB, dst=self._rgb_buf)
+        return self.find_pose_rgb(frame, self._rgb_buf, draw)
+
+    def find_pose_rgb(self, frame, frame_rgb, draw=False):
+        """
+        Same as `find_pose`, for callers that already hold an RGB copy of the frame, so
+        the color conversion isn't done twice.
+
+        Args:
+            frame: The BGR frame to draw on (only used if draw=True).
+            frame_rgb: The same frame in RGB order, which is what MediaPipe processes.
+            draw (bool): If True, draws the landmarks and connections on `frame`.
+
+        Returns:
+            A tuple (frame, landmarks), as returned by `find_pose`.
+        """
         # Process the frame to find the pose
-        self.results = self.pose.process(frame_rgb)
+        if self.landmarker is None:
+            self.results = self.pose.process(frame_rgb).pose_landmarks
+        else:
+            image = mp.Image(image_format=mp.ImageFormat.SRGB, data=frame_rgb)
+            if self.static_mode:
+                result = self.landmarker.detect(image)
+            else:
+                result = self.landmarker.detect_for_video(image, self._next_timestamp_ms())
+            self.results = result.pose_landmarks[0] if result.pose_landmarks else None
+        landmarks = self.results
         
         # Draw the pose annotation on the image
-        if self.results.pose_landmarks and draw:
-            self.mp_drawing.draw_landmarks(
-                frame,
-                self.results.pose_landmarks,
-                self.mp_pose.POSE_CONNECTIONS,
-                landmark_drawing_spec=self.mp_drawing.DrawingSpec(color=(255, 0, 255), thickness=2, circle_radius=2),
-                connection_drawing_spec=self.mp_drawing.DrawingSpec(color=(0, 255, 0), thickness=2, circle_radius=2)
-            )
+        if landmarks and draw:
+            draw_pose(frame, self.get_landmark_positions(frame.shape, landmarks), self._connections)
             
-        return frame, self.results.pose_landmarks
+        return frame, self.results
 
     def get_landmark_positions(self, frame_shape, landmarks):
         """
@@ -67,19 +181,21 @@ class PoseEstimator:
 
         Args:
             frame_shape: The shape of the frame (height, width).
-            landmarks: The pose landmarks detected by MediaPipe.
+            landmarks: The pose landmarks returned by `find_pose`.
 
         Returns:
-            A list of tuples, where each tuple is the (x, y) pixel coordinate of a landmark.
+            An (N, 2) int32 array with the (x, y) pixel coordinate of each landmark
+            (empty, shape (0, 2), if there are no landmarks).
         """
-        lm_list = []
-        if landmarks:
-            h, w, _ = frame_shape
-            for id, lm in enumerate(landmarks.landmark):
-                # Convert normalized coordinates (0.0 - 1.0) to pixel coordinates
-                cx, cy = int(lm.x * w), int(lm.y * h)
-                lm_list.append((cx, cy))
-        return lm_list
+        if not landmarks:
+            return np.empty((0, 2), dtype=np.int32)
+        h, w, _ = frame_shape
+        # The legacy solution returns a protobuf, the Tasks API a list of landmarks
+        points = getattr(landmarks, 'landmark', landmarks)
+        coords = np.fromiter((v for lm in points for v in (lm.x, lm.y)), dtype=np.float32, count=2 * len(points)).reshape(-1, 2)
+        # Convert normalized coordinates (0.0 - 1.0) to pixel coordinates
+        coords *= np.array([w, h], dtype=np.float32)
+        return coords.astype(np.int32)
     
     def check_suspicious_posture(self, landmarks_list):
         """
@@ -87,7 +203,7 @@ class PoseEstimator:
         This is a simple example: checks if the head is tilted significantly.
 
         Args:
-            landmarks_list: A list of (x, y) coordinates for all landmarks.
+            landmarks_list: An (N, 2) array of (x, y) coordinates for all landmarks.
 
         Returns:
             A boolean indicating if a suspicious posture was detected.
@@ -97,8 +213,8 @@ class PoseEstimator:
             
         # Example check: Head tilt. We compare the y-coordinates of the ears.
         # Landmark indices for left and right ears are 7 and 8.
-        left_ear_y = landmarks_list[self.mp_pose.PoseLandmark.LEFT_EAR.value][1]
-        right_ear_y = landmarks_list[self.mp_pose.PoseLandmark.RIGHT_EAR.value][1]
+        left_ear_y = int(landmarks_list[self.mp_pose.PoseLandmark.LEFT_EAR.value, 1])
+        right_ear_y = int(landmarks_list[self.mp_pose.PoseLandmark.RIGHT_EAR.value, 1])
         
         # A simple threshold for vertical ear difference. This can be tuned.
         ear_y_difference_threshold = 25 
@@ -33,9 +33,13 @@ document.addEventListener('DOMContentLoaded', () => {
         stopSupervisionUI();
     });
 
-    // This event receives the live video frame from the server
+    // This event receives the live video frame from the server as raw JPEG bytes.
+    // The previous object URL is released before the next one is swapped in.
+    let frameUrl = null;
     socket.on('video_frame', (data) => {
-        videoFeed.src = `data:image/jpeg;base64,${data.image}`;
+        if (frameUrl) URL.revokeObjectURL(frameUrl);
+        frameUrl = URL.createObjectURL(new Blob([data.image], { type: 'image/jpeg' }));
+        videoFeed.src = frameUrl;
         fpsStat.textContent = data.fps;
         facesStat.textContent = data.face_count;
     });
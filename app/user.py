@@ -1,24 +1,37 @@
 # /app/user.py
+from argon2 import PasswordHasher
+from argon2.exceptions import VerificationError, InvalidHashError
 from flask_login import UserMixin
 
+# One hasher for the whole app; it holds the Argon2 cost parameters
+_ph = PasswordHasher()
+
 class User(UserMixin):
     """A user class with roles for Flask-Login."""
     def __init__(self, id, username, password, role):
         self.id = id
         self.username = username
-        self.password = password
+        self.password = password # Argon2 hash, never the plaintext
         self.role = role # Admin or Invigilator
 
+    def verify(self, raw_password):
+        """Checks a login attempt against the stored Argon2 hash."""
+        try:
+            return _ph.verify(self.password, raw_password)
+        except (VerificationError, InvalidHashError):
+            return False
+
 # For this project, we'll use a simple hardcoded user dictionary.
-# A real-world application would store hashed passwords in the database.
+# The seed passwords are hashed once at startup; a real-world application would store the hashes in the database.
 users = {
-    "invigilator": User(id="1", username="invigilator", password="password123", role="invigilator"),
-    "admin": User(id="2", username="admin", password="adminpassword", role="admin")
+    "invigilator": User(id="1", username="invigilator", password=_ph.hash("password123"), role="invigilator"),
+    "admin": User(id="2", username="admin", password=_ph.hash("adminpassword"), role="admin")
 }
 
+# Flask-Login loads the user by ID on every request, so keep an ID index next to the
+# username-keyed dict that the login form uses
+_users_by_id = {user.id: user for user in users.values()}
+
 # Helper function to get a user by their ID
 def get_user(user_id):
-    for user in users.values():
-        if user.id == user_id:
-            return user
-    return None
+    return _users_by_id.get(user_id)
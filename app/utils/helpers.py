@@ -0,0 +1,335 @@
+# /app/utils/helpers.py
+
+import csv
+import datetime
+import logging.handlers
+import os
+import queue
+import sys
+import threading
+import time
+import weakref
+import cv2
+import numpy as np
+
+from ..config import OPENCV_THREADS, CAMERA_FPS, ATTENDANCE_REPORTS_DIR
+
+def configure_opencv():
+    """
+    Turns on OpenCV's optimized (SIMD) code paths and sizes its internal thread pool to
+    OPENCV_THREADS, so it doesn't oversubscribe the cores the models run on.
+    """
+    cv2.setUseOptimized(True)
+    cv2.setNumThreads(OPENCV_THREADS)
+
+def scale_box(box, factor):
+    """
+    Scales a bounding box detected on a resized frame back to the original frame.
+
+    Args:
+        box (tuple): The box coordinates, in any order (e.g. (top, right, bottom, left)).
+        factor (float): The multiplier that maps the resized frame onto the original one.
+
+    Returns:
+        A tuple of integer coordinates in the same order as `box`.
+    """
+    return tuple(int(c * factor) for c in box)
+
+def draw_boxes(frame, boxes, color, thickness=2):
+    """
+    Draws any number of same-colored rectangles with a single cv2.polylines call
+    instead of one cv2.rectangle call per box.
+
+    Args:
+        frame: The image frame to draw on (modified in place).
+        boxes (list): Boxes as (x1, y1, x2, y2) corner coordinates.
+        color (tuple): BGR color of the rectangles.
+        thickness (int): Line thickness in pixels.
+    """
+    if len(boxes) == 0:
+        return
+    x1, y1, x2, y2 = np.asarray(boxes, dtype=np.int32).T
+    # (N, 4, 2): the four corners of each box, in drawing order
+    corners = np.stack([
+        np.stack([x1, y1], axis=1),
+        np.stack([x2, y1], axis=1),
+        np.stack([x2, y2], axis=1),
+        np.stack([x1, y2], axis=1),
+    ], axis=1)
+    cv2.polylines(frame, corners, True, color, thickness)
+
+def render_label(text, font, font_scale, color, thickness):
+    """
+    Rasterizes a text label once, so that it can be stamped onto frames with `blit_label`
+    instead of running cv2.putText on every frame.
+
+    Returns:
+        A label tuple (tile, mask, dx, dy): the rendered text, the mask of its pixels, and
+        the offset from the cv2.putText-style origin to the tile's top-left corner.
+    """
+    (w, h), baseline = cv2.getTextSize(text, font, font_scale, thickness)
+    pad = thickness
+    tile = np.zeros((h + baseline + 2 * pad, w + 2 * pad, 3), dtype=np.uint8)
+    cv2.putText(tile, text, (pad, h + pad), font, font_scale, color, thickness)
+    return tile, tile.any(axis=2), -pad, -(h + pad)
+
+def blit_label(frame, label, origin):
+    """
+    Stamps a label from `render_label` onto `frame` (in place), placed exactly where
+    cv2.putText would draw it for the same bottom-left `origin`. Clipped at the frame edges.
+    """
+    tile, mask, dx, dy = label
+    x0, y0 = origin[0] + dx, origin[1] + dy
+    fx0, fy0 = max(x0, 0), max(y0, 0)
+    fx1, fy1 = min(x0 + tile.shape[1], frame.shape[1]), min(y0 + tile.shape[0], frame.shape[0])
+    if fx0 >= fx1 or fy0 >= fy1:
+        return
+    rows, cols = slice(fy0 - y0, fy1 - y0), slice(fx0 - x0, fx1 - x0)
+    np.copyto(frame[fy0:fy1, fx0:fx1], tile[rows, cols], where=mask[rows, cols, None])
+
+# --- Camera Helpers ---
+
+# Capture backend with the lowest grab latency on each platform (DirectShow adds 100-200 ms on Windows)
+if sys.platform == 'win32':
+    CAMERA_BACKEND = cv2.CAP_MSMF
+elif sys.platform.startswith('linux'):
+    CAMERA_BACKEND = cv2.CAP_V4L2
+else:
+    CAMERA_BACKEND = cv2.CAP_ANY
+
+def open_camera(camera_index, backend=None):
+    """
+    Opens a camera on the platform's preferred backend and asks it for MJPG frames, so
+    USB webcams send compressed frames instead of raw YUY2 and reach their full frame
+    rate. The driver buffer is kept to one frame to avoid handing out stale frames.
+    Settings the camera doesn't support are silently ignored by OpenCV.
+
+    Args:
+        camera_index (int): Index of the camera device.
+        backend (int, optional): A cv2.CAP_* backend; defaults to CAMERA_BACKEND.
+
+    Returns:
+        The cv2.VideoCapture. The caller must check `isOpened()`.
+    """
+    cap = cv2.VideoCapture(camera_index, CAMERA_BACKEND if backend is None else backend)
+    if cap.isOpened():
+        cap.set(cv2.CAP_PROP_FOURCC, cv2.VideoWriter_fourcc(*'MJPG'))
+        cap.set(cv2.CAP_PROP_FPS, CAMERA_FPS)
+        cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+    return cap
+
+class LatestFrame:
+    """
+    A thread-safe, single-slot frame buffer. Writers overwrite the slot, so a reader
+    always gets the freshest frame and stale frames are simply discarded.
+    """
+    def __init__(self):
+        self._cond = threading.Condition()
+        self._frame = None
+
+    def put(self, frame):
+        """Replaces the buffered frame with a newer one."""
+        with self._cond:
+            self._frame = frame
+            self._cond.notify()
+
+    def get(self, timeout=1.0):
+        """
+        Takes the buffered frame, waiting up to `timeout` seconds for one to arrive.
+        Returns None if no new frame showed up in time.
+        """
+        with self._cond:
+            if self._frame is None:
+                self._cond.wait(timeout)
+            frame, self._frame = self._frame, None
+            return frame
+
+class FrameGrabber:
+    """
+    Continuously drains an opened cv2.VideoCapture on a background thread, keeping only
+    the newest frame. This stops the driver's internal buffer from handing stale frames to
+    a slow consumer, and frames that would never be processed are never decoded.
+    """
+    def __init__(self, cap):
+        self.cap = cap
+        self.latest = LatestFrame()
+        self._stop_event = threading.Event()
+        self._thread = None
+
+    def start(self):
+        """Starts the grabber thread and returns self for chaining."""
+        self._thread = threading.Thread(target=self._run, name="frame_grabber", daemon=True)
+        self._thread.start()
+        return self
+
+    def read(self, timeout=1.0):
+        """Returns the freshest frame, or None if the camera produced nothing within `timeout`."""
+        return self.latest.get(timeout)
+
+    def stop(self):
+        """Stops the grabber thread. The capture itself is left for the caller to release."""
+        self._stop_event.set()
+        if self._thread:
+            self._thread.join()
+
+    def _run(self):
+        while not self._stop_event.is_set():
+            # grab() only pulls the frame off the device; decoding happens in retrieve()
+            if not self.cap.grab():
+                time.sleep(0.01)
+                continue
+            ret, frame = self.cap.retrieve()
+            if ret:
+                self.latest.put(frame)
+
+class CameraBroker:
+    """
+    Owns a single camera device and multicasts its frames to any number of subscribers.
+    Every subscriber gets its own LatestFrame slot, so a slow consumer only ever skips
+    frames and never holds up the others. The device is opened when the first subscriber
+    arrives and released when the last one leaves.
+
+    Frames are shared between subscribers and must be treated as read-only.
+    """
+    def __init__(self, camera_index, backend=None):
+        self.camera_index = camera_index
+        self.backend = backend
+        self._subscribers = weakref.WeakSet()
+        self._subscribers_lock = threading.Lock()
+        self._lifecycle_lock = threading.Lock()
+        self._cap = None
+        self._thread = None
+        self._stop_event = None
+
+    def subscribe(self):
+        """
+        Registers a new consumer and returns its LatestFrame slot, opening the camera if needed.
+        Returns None if the camera cannot be opened.
+        """
+        with self._lifecycle_lock:
+            if self._cap is None:
+                cap = open_camera(self.camera_index, self.backend)
+                if not cap.isOpened():
+                    cap.release()
+                    return None
+                self._cap = cap
+                self._stop_event = threading.Event()
+                self._thread = threading.Thread(target=self._run, args=(cap, self._stop_event), name="camera_broker", daemon=True)
+                self._thread.start()
+            slot = LatestFrame()
+            with self._subscribers_lock:
+                self._subscribers.add(slot)
+            return slot
+
+    def unsubscribe(self, slot):
+        """Removes a consumer, releasing the camera once nobody is subscribed."""
+        with self._lifecycle_lock:
+            with self._subscribers_lock:
+                self._subscribers.discard(slot)
+                if len(self._subscribers) > 0:
+                    return
+            if self._cap is not None:
+                self._stop_event.set()
+                self._thread.join()
+                self._cap.release()
+                self._cap = None
+
+    def _run(self, cap, stop_event):
+        while not stop_event.is_set():
+            if not cap.grab():
+                time.sleep(0.01)
+                continue
+            ret, frame = cap.retrieve()
+            if not ret:
+                continue
+            with self._subscribers_lock:
+                slots = list(self._subscribers)
+            for slot in slots:
+                slot.put(frame)
+
+# --- Attendance Helpers ---
+
+class AttendanceLog:
+    """
+    The day's attendance CSV together with an `.ids` sidecar holding just the roll numbers
+    marked so far, one per line, so `run_attendance.py` and the dashboard can both skip
+    students marked by either of them earlier in the day without rescanning the CSV.
+    Each row written to the CSV is mirrored to the sidecar. A sidecar that is missing or
+    older than the CSV (e.g. the CSV was appended to by an older version) is rebuilt from it.
+
+    Use `student_id in log` to check whether a student is already marked.
+    """
+    def __init__(self, date=None):
+        date = date or datetime.date.today()
+        self.log_file_path = os.path.join(ATTENDANCE_REPORTS_DIR, f"attendance_{date}.csv")
+        self.ids_file_path = os.path.join(ATTENDANCE_REPORTS_DIR, f"attendance_{date}.ids")
+        self.marked = self._load()
+        # Both files stay open for the session; line buffering still writes each row out as it is marked
+        self._log_fh = open(self.log_file_path, 'a', newline='', buffering=1)
+        self._log_writer = csv.writer(self._log_fh)
+        self._ids_fh = open(self.ids_file_path, 'a', buffering=1)
+
+    def _load(self):
+        """Returns the roll numbers already marked today, creating the files if needed."""
+        if not os.path.exists(self.log_file_path):
+            with open(self.log_file_path, 'w', newline='') as f:
+                csv.writer(f).writerow(['Timestamp', 'RollNumber', 'Name'])
+            # Start a matching empty sidecar, in case an old one was left behind
+            open(self.ids_file_path, 'w').close()
+            return set()
+
+        if os.path.exists(self.ids_file_path) and \
+                os.path.getmtime(self.ids_file_path) >= os.path.getmtime(self.log_file_path):
+            with open(self.ids_file_path, 'r') as f:
+                return set(f.read().splitlines())
+
+        # The CSV has rows the sidecar doesn't know about: scan it once and rewrite the sidecar
+        with open(self.log_file_path, 'r', newline='') as f:
+            reader = csv.reader(f)
+            next(reader, None) # Skip header
+            marked = {row[1] for row in reader if len(row) > 1}
+        with open(self.ids_file_path, 'w') as f:
+            f.writelines(f"{student_id}\n" for student_id in marked)
+        return marked
+
+    def __contains__(self, student_id):
+        return student_id in self.marked
+
+    def mark(self, student_id, student_name, timestamp):
+        """
+        Appends a row for a student unless they are already marked today.
+
+        Returns:
+            True if the student was marked now, False if they already were.
+        """
+        if student_id in self.marked:
+            return False
+        self._log_writer.writerow([timestamp, student_id, student_name])
+        # Written after the CSV row, so an up-to-date sidecar is never older than the CSV
+        self._ids_fh.write(f"{student_id}\n")
+        self.marked.add(student_id)
+        return True
+
+    def close(self):
+        self._log_fh.close()
+        self._ids_fh.close()
+
+# --- Logging Helpers ---
+
+class DeferredQueueHandler(logging.handlers.QueueHandler):
+    """
+    A QueueHandler for hot loops. The stock handler formats each record on the calling
+    thread before queueing it; this one queues the raw record so that all formatting and
+    I/O happen on the QueueListener's thread, and silently drops records when the queue
+    is full instead of blocking or raising.
+
+    Arguments passed to the logger must not be mutated after the call.
+    """
+    def prepare(self, record):
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            pass
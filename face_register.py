@@ -1,7 +1,12 @@
 # /face_register.py
 
-import cv2
 import os
+
+# Set before any numeric import; OpenMP reads it once at load (see app/main.py)
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
+import cv2
+import numpy as np
 import sys
 import time
 
@@ -10,7 +15,8 @@ sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 # Now we can import from our app package
 from app.ml_models.face_detector import FaceRecognizer
-from app.config import CAMERA_INDEX # We'll use a default, but allow override
+from app.config import CAMERA_INDEX, initialize_directories # We'll use a default, but allow override
+from app.utils.helpers import FrameGrabber, open_camera
 
 # A simple global to manage camera mode, similar to your original code
 CAMERA_MODE_INDEX = CAMERA_INDEX
@@ -20,12 +26,12 @@ def register_from_webcam(recognizer):
     Handles the interactive process of registering a new student via webcam.
     """
     print(f"\n[INFO] Opening camera with index: {CAMERA_MODE_INDEX}")
-    cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+    cap = open_camera(CAMERA_INDEX)
     time.sleep(2.0) # Give the camera 2 seconds to initialize
     if not cap.isOpened():
         print(f"[ERROR] Camera at index {CAMERA_INDEX} is not available. Retrying...")
         cap.release()
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+        cap = open_camera(CAMERA_INDEX)
         if not cap.isOpened():
             print("[FATAL] Cannot open camera. Please check camera drivers and ensure it is not in use by another application.")
             return
@@ -49,17 +55,21 @@ def register_from_webcam(recognizer):
     print("\n[INFO] Look at the camera. Press [SPACE] to capture your face.")
     print("[INFO] Press [Q] to cancel registration.")
     
+    # Capture runs on its own thread so the preview always shows the newest frame
+    grabber = FrameGrabber(cap).start()
+    display_frame = None
     while True:
-        ret, frame = cap.read()
-        if not ret:
+        frame = grabber.read()
+        if frame is None:
             # Add a check here for empty frames which cause the blank screen
             print("[WARNING] Blank frame received. Skipping...")
-            time.sleep(0.1)
             continue
         
         status_msg = ""
-        # Create a copy to draw on
-        display_frame = frame.copy()
+        # Create a copy to draw on, reusing the same buffer every frame
+        if display_frame is None or display_frame.shape != frame.shape:
+            display_frame = np.empty_like(frame)
+        np.copyto(display_frame, frame)
         
         # We can draw a simple box to guide the user
         h, w, _ = display_frame.shape
@@ -87,6 +97,7 @@ def register_from_webcam(recognizer):
             print("[INFO] Registration cancelled by user.")
             break
             
+    grabber.stop()
     cap.release()
     cv2.destroyAllWindows()
 
@@ -144,5 +155,6 @@ def main_menu():
 
 
 if __name__ == "__main__":
+    initialize_directories()
     main_menu()
 
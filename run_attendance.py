@@ -1,70 +1,83 @@
 # /run_attendance.py
 
+import os
+
+# Set before any numeric import; OpenMP reads it once at load (see app/main.py)
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
 import cv2
 import time
 import datetime
-import os
 import sys
-import csv
+import atexit
+import signal
+import threading
 
 # Add the 'app' directory to the Python path
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
 
 from app.ml_models.face_detector import FaceRecognizer
-from app.config import CAMERA_INDEX, ATTENDANCE_REPORTS_DIR
+from app.config import CAMERA_INDEX, DETECTION_SCALE, HEADLESS, initialize_directories
+from app.utils.helpers import AttendanceLog, FrameGrabber, render_label, blit_label, open_camera
+
+LABEL_FONT = (cv2.FONT_HERSHEY_SIMPLEX, 0.7)
 
 class AttendanceSystem:
     def __init__(self):
         self.recognizer = FaceRecognizer()
-        self.log_file_path = os.path.join(ATTENDANCE_REPORTS_DIR, f"attendance_{datetime.date.today()}.csv")
-        self.todays_attendance = self._load_todays_attendance()
-        print(f"[INFO] Attendance System initialized. Logging to {self.log_file_path}")
-
-    def _load_todays_attendance(self):
-        """Loads today's attendance log to avoid duplicate entries."""
-        if not os.path.exists(self.log_file_path):
-            with open(self.log_file_path, 'w', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow(['Timestamp', 'RollNumber', 'Name'])
-            return set()
-        
-        with open(self.log_file_path, 'r') as f:
-            reader = csv.reader(f)
-            next(reader) # Skip header
-            return {row[1] for row in reader}
+        self.attendance_log = AttendanceLog()
+        atexit.register(self.attendance_log.close)
+        # Prerendered (color, label) per student, built once they are marked and their label stops changing
+        self._label_cache = {}
+        print(f"[INFO] Attendance System initialized. Logging to {self.attendance_log.log_file_path}")
 
     def mark_attendance(self, student_id, student_name):
         """Marks attendance for a student if not already marked today."""
-        if student_id not in self.todays_attendance:
-            timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            with open(self.log_file_path, 'a', newline='') as f:
-                writer = csv.writer(f)
-                writer.writerow([timestamp, student_id, student_name])
-            self.todays_attendance.add(student_id)
+        timestamp = datetime.datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+        if self.attendance_log.mark(student_id, student_name, timestamp):
             print(f"[ATTENDANCE] Marked: {student_name} ({student_id}) at {timestamp}")
 
+    def _compute_label(self, student_id, name):
+        """Builds the box color and rendered label for a face; final ones are cached per student."""
+        if name == "Unknown":
+            color, text = (0, 0, 255), "Unknown"
+        elif student_id in self.attendance_log:
+            color, text = (255, 165, 0), f"{name} ({student_id}) (Marked)" # Orange for already marked
+        else:
+            color, text = (0, 255, 0), f"{name} ({student_id})"
+        entry = (color, render_label(text, *LABEL_FONT, color, 2))
+        # Only the marked state is final, so unmarked students never get a stale cache entry
+        if name == "Unknown" or student_id in self.attendance_log:
+            self._label_cache[student_id] = entry
+        return entry
+
     def run(self):
-        print("[INFO] Starting Attendance System. Press 'q' to quit.")
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+        print(f"[INFO] Starting Attendance System. Press {'Ctrl+C' if HEADLESS else 'q'} to quit.")
+        cap = open_camera(CAMERA_INDEX)
         time.sleep(2.0) # Give the camera 2 seconds to initialize
         if not cap.isOpened():
             print(f"[ERROR] Camera at index {CAMERA_INDEX} is not available. Retrying...")
             cap.release()
-            cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+            cap = open_camera(CAMERA_INDEX)
             if not cap.isOpened():
                 print("[FATAL] Cannot open camera. Please check camera drivers and ensure it is not in use by another application.")
                 return
         
-        while True:
-            ret, frame = cap.read()
-            if not ret:
+        # Capture runs on its own thread so the loop always gets the newest frame
+        grabber = FrameGrabber(cap).start()
+        # Ctrl+C ends the loop cleanly, which is the only way to stop it when headless
+        stop_event = threading.Event()
+        previous_handler = signal.signal(signal.SIGINT, lambda *_: stop_event.set())
+        while not stop_event.is_set():
+            frame = grabber.read()
+            if frame is None:
                 # Add a check here for empty frames which cause the blank screen
                 print("[WARNING] Blank frame received. Skipping...")
-                time.sleep(0.1)
                 continue
             
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_data = self.recognizer.recognize_faces(rgb_frame)
+            # Faces are found on a downscaled BGR copy (no RGB conversion); boxes come back at full resolution
+            small_frame = cv2.resize(frame, (0, 0), fx=DETECTION_SCALE, fy=DETECTION_SCALE)
+            face_data = self.recognizer.recognize_faces(small_frame, color_order='bgr', scale=1 / DETECTION_SCALE)
             
             for person in face_data:
                 student_id = person.get('id')
@@ -72,28 +85,28 @@ class AttendanceSystem:
                     self.mark_attendance(student_id, person.get('name'))
 
                 # Drawing logic
-                box = person['box']
-                name = person['name']
-                top, right, bottom, left = box
-                color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
-                label = f"{name} ({student_id})" if name != "Unknown" else "Unknown"
-                if student_id in self.todays_attendance:
-                    label += " (Marked)"
-                    color = (255, 165, 0) # Orange for already marked
+                top, right, bottom, left = person['box']
+                color, label = self._label_cache.get(student_id) or self._compute_label(student_id, person['name'])
                 
                 cv2.rectangle(frame, (left, top), (right, bottom), color, 2)
-                cv2.putText(frame, label, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+                blit_label(frame, label, (left, top - 10))
 
-            cv2.imshow("Daily Attendance System", frame)
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            if not HEADLESS:
+                cv2.imshow("Daily Attendance System", frame)
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
                 
+        signal.signal(signal.SIGINT, previous_handler)
+        grabber.stop()
         cap.release()
-        cv2.destroyAllWindows()
+        self.attendance_log.close()
+        if not HEADLESS:
+            cv2.destroyAllWindows()
         print("[INFO] Attendance System stopped.")
         
 
 if __name__ == "__main__":
+    initialize_directories()
     system = AttendanceSystem()
     system.run()
 
@@ -1,8 +1,14 @@
 # /run_supervision.py - FINAL VERSION
 
+import os
+
+# Set before any numeric import; OpenMP reads it once at load (see app/main.py)
+os.environ.setdefault('OMP_NUM_THREADS', '1')
+
 import cv2
 import time
-import os
+import threading
+import signal
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'app'))
@@ -13,7 +19,8 @@ from app.ml_models.pose_estimation import PoseEstimator
 from app.ml_models.gaze_tracking import GazeTracker
 from app.ml_models.audio_analysis import AudioAnalyzer
 from app.ml_models.alert_system import generate_alerts
-from app.config import CAMERA_INDEX
+from app.config import CAMERA_INDEX, HEADLESS, DETECTION_SCALE, OBJECT_DETECT_EVERY, FACE_RECOGNIZE_EVERY, MIN_ANALYSIS_FACE_SIZE
+from app.utils.helpers import LatestFrame, FrameGrabber, draw_boxes, open_camera
 
 class SupervisionSystem:
     def __init__(self):
@@ -24,18 +31,29 @@ class SupervisionSystem:
         self.gaze_tracker = GazeTracker()
         self.audio_analyzer = AudioAnalyzer()
         self.alert_system = generate_alerts
+        # Each model runs on its own worker thread and publishes its latest result here;
+        # the display loop fuses whatever is newest, so throughput is set by the slowest
+        # stage instead of the sum of all of them.
+        self.stop_event = threading.Event()
+        self.frame_idx = 0
+        self.last_object_data = []
+        self.last_face_data = []
+        self.last_gaze_data = []
+        self.last_posture = False
+        # Pose and gaze only run while a face big enough to analyze is in view
+        self.face_in_view = False
         print("[INFO] All models initialized successfully.")
 
     def run_standalone(self):
         """
         Main execution method for standalone mode
         """
-        print("[INFO] Starting Exam Supervision (Standalone Mode). Press 'q' to quit.")
+        print(f"[INFO] Starting Exam Supervision (Standalone Mode). Press {'Ctrl+C' if HEADLESS else 'q'} to quit.")
         
         # Start audio for standalone execution
         self.audio_analyzer.start()
         
-        cap = cv2.VideoCapture(CAMERA_INDEX, cv2.CAP_DSHOW)
+        cap = open_camera(CAMERA_INDEX)
         time.sleep(2.0)
 
         if not cap.isOpened():
@@ -43,44 +61,164 @@ class SupervisionSystem:
             self.audio_analyzer.stop()
             return
 
-        while True:
-            ret, frame = cap.read()
-            if not ret:
+        # --- Stage Workers ---
+        # Every stage only ever looks at the newest frame; YOLO gets every OBJECT_DETECT_EVERY-th one
+        face_in, gaze_in, pose_in, object_in = LatestFrame(), LatestFrame(), LatestFrame(), LatestFrame()
+        self.stop_event.clear()
+        workers = [
+            threading.Thread(target=self._face_worker, args=(face_in, gaze_in), name="face_worker", daemon=True),
+            threading.Thread(target=self._gaze_worker, args=(gaze_in,), name="gaze_worker", daemon=True),
+            threading.Thread(target=self._object_worker, args=(object_in,), name="object_worker", daemon=True),
+            threading.Thread(target=self._pose_worker, args=(pose_in,), name="pose_worker", daemon=True),
+        ]
+        for worker in workers:
+            worker.start()
+        # Capture runs on its own thread too, so a slow frame never delays the next grab
+        grabber = FrameGrabber(cap).start()
+        # Ctrl+C stops the pipeline cleanly, which is the only way to stop it when headless
+        previous_handler = signal.signal(signal.SIGINT, lambda *_: self.stop_event.set())
+
+        while not self.stop_event.is_set():
+            frame = grabber.read()
+            if frame is None:
                 print("[WARNING] Blank frame received. Skipping...")
-                time.sleep(0.1)
                 continue
 
-            # Process frame
-            rgb_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2RGB)
-            face_data = self.face_recognizer.recognize_faces(rgb_frame)
-            object_data = self.object_detector.detect_objects(frame)
-            _, landmarks = self.pose_estimator.find_pose(frame.copy(), draw=False)
-            lm_list = self.pose_estimator.get_landmark_positions(frame.shape, landmarks) if landmarks else []
-            is_suspicious_posture = self.pose_estimator.check_suspicious_posture(lm_list) if lm_list else False
-            gaze_data = self.gaze_tracker.get_gaze_direction(frame)
-            is_sound_detected = self.audio_analyzer.is_sound_detected()
-            
-            alerts = self.alert_system(face_data, object_data, gaze_data, is_suspicious_posture, is_sound_detected)
-            
-            if alerts:
-                print(f"[{time.strftime('%H:%M:%S')}] ALERTS: {alerts}")
-
-            display_frame = self.draw_results(frame, face_data, object_data, alerts)
-            cv2.imshow("Exam Supervision System", display_frame)
-            
-            if cv2.waitKey(1) & 0xFF == ord('q'):
-                break
+            face_in.put(frame)
+            pose_in.put(frame)
+            if self.frame_idx % OBJECT_DETECT_EVERY == 0:
+                object_in.put(frame)
+            self.frame_idx += 1
+
+            display_frame = self.fuse_results(frame)
+            if not HEADLESS:
+                cv2.imshow("Exam Supervision System", display_frame)
+                
+                if cv2.waitKey(1) & 0xFF == ord('q'):
+                    break
 
         print("[INFO] Shutting down supervision system...")
+        self.stop_event.set()
+        signal.signal(signal.SIGINT, previous_handler)
+        for worker in workers:
+            worker.join()
+        grabber.stop()
         self.audio_analyzer.stop()
         cap.release()
-        cv2.destroyAllWindows()
+        if not HEADLESS:
+            cv2.destroyAllWindows()
+
+    def _face_worker(self, frames, gaze_out):
+        """Detects faces on every frame it gets and identifies them every FACE_RECOGNIZE_EVERY-th run."""
+        runs = 0
+        while not self.stop_event.is_set():
+            frame = frames.get(timeout=0.5)
+            if frame is None:
+                continue
+            # Faces are detected on a downscaled copy; boxes come back at full resolution
+            small_frame = cv2.resize(frame, (0, 0), fx=DETECTION_SCALE, fy=DETECTION_SCALE)
+            face_locations, face_landmarks_list = self.face_recognizer.detect_faces(small_frame, color_order='bgr')
+            # Size of the largest face (its shorter side) at full resolution
+            largest = max((min(bottom - top, right - left) for top, right, bottom, left in face_locations), default=0) / DETECTION_SCALE
+            self.face_in_view = largest >= MIN_ANALYSIS_FACE_SIZE
+            if self.face_in_view:
+                gaze_out.put((small_frame, face_locations, face_landmarks_list))
+            else:
+                self.last_gaze_data = None
+            if runs % FACE_RECOGNIZE_EVERY == 0:
+                self.last_face_data = self.face_recognizer.recognize_faces(small_frame, color_order='bgr', face_locations=face_locations, scale=1 / DETECTION_SCALE)
+            runs += 1
+
+    def _gaze_worker(self, faces):
+        """Estimates gaze from the landmarks the face worker just found."""
+        while not self.stop_event.is_set():
+            item = faces.get(timeout=0.5)
+            if item is None:
+                continue
+            small_frame, face_locations, face_landmarks_list = item
+            self.last_gaze_data = self.gaze_tracker.get_gaze_direction(small_frame, face_locations, face_landmarks_list, scale=1 / DETECTION_SCALE)
+
+    def _object_worker(self, frames):
+        """
+        Runs YOLO on the newest sampled frame. Only every OBJECT_DETECT_EVERY-th frame is
+        sampled, so a single camera never queues up enough frames to fill a batch in time,
+        and each one is detected on its own as soon as it arrives.
+        """
+        while not self.stop_event.is_set():
+            frame = frames.get(timeout=0.5)
+            if frame is None:
+                continue
+            self.last_object_data = self.object_detector.detect_objects(frame)
+
+    def _pose_worker(self, frames):
+        """Tracks body pose and flags suspicious postures."""
+        while not self.stop_event.is_set():
+            frame = frames.get(timeout=0.5)
+            if frame is None:
+                continue
+            if not self.face_in_view:
+                self.last_posture = False
+                continue
+            _, landmarks = self.pose_estimator.find_pose(frame, draw=False)
+            lm_list = self.pose_estimator.get_landmark_positions(frame.shape, landmarks)
+            self.last_posture = self.pose_estimator.check_suspicious_posture(lm_list)
+
+    def fuse_results(self, frame):
+        """
+        Combines the newest result of every stage into alerts for the current frame.
+
+        Args:
+            frame: The BGR camera frame that is about to be shown.
+
+        Returns:
+            The frame to display.
+        """
+        face_data, object_data = self.last_face_data, self.last_object_data
+        is_sound_detected = self.audio_analyzer.is_sound_detected()
+        
+        alerts = self.alert_system(face_data, object_data, self.last_gaze_data, self.last_posture, is_sound_detected)
+        
+        if alerts:
+            print(f"[{time.strftime('%H:%M:%S')}] ALERTS: {alerts}")
+
+        # Nothing is shown when headless, so there is nothing to draw
+        return frame if HEADLESS else self.draw_results(frame, face_data, object_data, alerts)
 
     def draw_results(self, frame, face_data, object_data, alerts):
-        """Draws results on frame"""
-        # ... your existing draw_results implementation ...
-        return frame
+        """
+        Draws the face boxes and names, the detected objects and an alert banner.
+
+        Args:
+            frame: The BGR camera frame. The stage workers may still be reading it,
+                   so it is left untouched and a copy is drawn on.
+            face_data (list): The results of `FaceRecognizer.recognize_faces`.
+            object_data (list): The results of `ObjectDetector.detect_objects`.
+            alerts (list): The alerts raised for this frame.
+
+        Returns:
+            The annotated copy of the frame.
+        """
+        display_frame = frame.copy()
+        # Face boxes, one polylines call per color
+        known_boxes, unknown_boxes = [], []
+        for person in face_data:
+            top, right, bottom, left = person['box']
+            name = person.get('name', 'Unknown')
+            color = (0, 255, 0) if name != "Unknown" else (0, 0, 255)
+            (known_boxes if name != "Unknown" else unknown_boxes).append((left, top, right, bottom))
+            cv2.putText(display_frame, name, (left, top - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, color, 2)
+        draw_boxes(display_frame, known_boxes, (0, 255, 0))
+        draw_boxes(display_frame, unknown_boxes, (0, 0, 255))
+
+        draw_boxes(display_frame, [obj['box'] for obj in object_data], (255, 0, 0))
+        for obj in object_data:
+            x1, y1, _, _ = obj['box']
+            cv2.putText(display_frame, obj['label'], (x1, y1 - 10), cv2.FONT_HERSHEY_SIMPLEX, 0.7, (255, 0, 0), 2)
+
+        if alerts:
+            cv2.putText(display_frame, "ALERT!", (10, 30), cv2.FONT_HERSHEY_TRIPLEX, 1, (0, 0, 255), 2)
+        return display_frame
 
 if __name__ == "__main__":
     system = SupervisionSystem()
-    system.run_standalone()  # Changed from system.run()
\ No newline at end of file
+    system.run_standalone()  # Changed from system.run()
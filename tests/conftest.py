@@ -0,0 +1,7 @@
+# /tests/conftest.py
+
+import os
+import sys
+
+# Lets a plain `pytest` run from the repository root import the `app` package
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,44 @@
+# /tests/test_attendance_log.py
+
+import csv
+import datetime
+import os
+
+import pytest
+
+pytest.importorskip("cv2")
+
+from app.utils import helpers
+
+
+@pytest.fixture
+def reports_dir(tmp_path, monkeypatch):
+    monkeypatch.setattr(helpers, "ATTENDANCE_REPORTS_DIR", str(tmp_path))
+    return tmp_path
+
+
+def test_marks_each_student_once_across_sessions(reports_dir):
+    log = helpers.AttendanceLog()
+    assert log.mark("101", "Asha", "09:00")
+    assert not log.mark("101", "Asha", "09:01")
+    log.close()
+
+    log = helpers.AttendanceLog()
+    assert "101" in log
+    assert not log.mark("101", "Asha", "09:02")
+    log.close()
+
+
+def test_rebuilds_the_sidecar_from_a_newer_csv(reports_dir):
+    helpers.AttendanceLog().close()
+    log_file_path = reports_dir / f"attendance_{datetime.date.today()}.csv"
+    # Another writer appends to the CSV without updating the sidecar
+    with open(log_file_path, "a", newline="") as f:
+        csv.writer(f).writerow(["09:00", "102", "Ravi"])
+    ids_file_path = reports_dir / f"attendance_{datetime.date.today()}.ids"
+    os.utime(ids_file_path, (0, 0))
+
+    log = helpers.AttendanceLog()
+    assert "102" in log
+    assert not log.mark("102", "Ravi", "09:05")
+    log.close()
@@ -0,0 +1,30 @@
+# /tests/test_object_detection.py
+
+import os
+
+import pytest
+
+pytest.importorskip("ultralytics")
+
+from ultralytics.engine.exporter import export_formats
+from ultralytics.nn.autobackend import AutoBackend
+
+from app.config import MODELS_DIR
+from app.ml_models.object_detection import export_names
+
+# The Ultralytics export format AutoBackend must load each cached export with
+EXPECTED_FORMATS = {
+    'TensorRT INT8': 'engine',
+    'TensorRT FP16': 'engine',
+    'OpenVINO INT8': 'openvino',
+    'OpenVINO FP32': 'openvino',
+    'ONNX Runtime': 'onnx',
+}
+
+
+@pytest.mark.parametrize("backend, export_format", sorted(EXPECTED_FORMATS.items()))
+def test_cached_export_names_resolve_to_their_backend(backend, export_format):
+    cached_path = os.path.join(MODELS_DIR, export_names("yolov8n", "sm86")[backend])
+    formats = list(export_formats()["Argument"])
+    model_types = AutoBackend._model_type(cached_path)[:len(formats)]
+    assert [fmt for fmt, found in zip(formats, model_types) if found] == [export_format]
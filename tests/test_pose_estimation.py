@@ -0,0 +1,19 @@
+# /tests/test_pose_estimation.py
+
+import numpy as np
+import pytest
+
+pytest.importorskip("mediapipe")
+
+from app.ml_models.pose_estimation import draw_pose
+
+
+def test_draw_pose_marks_every_landmark():
+    frame = np.zeros((60, 60, 3), dtype=np.uint8)
+    points = np.array([[10, 10], [45, 40]], dtype=np.int32)
+    draw_pose(frame, points, np.empty((0, 2), dtype=np.int32))
+
+    drawn = frame.any(axis=2)
+    assert drawn[10, 10] and drawn[40, 45]
+    # Each landmark is a dot a few pixels across, not a single pixel
+    assert drawn[:25].sum() > 9 and drawn[25:].sum() > 9